@@ -1,32 +1,83 @@
 # Corpus.py
+from __future__ import annotations
 
 import re
 import pickle
-import pandas as pd
-from typing import Dict, Optional, List, Tuple
+from bisect import bisect_right
+
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple
 from datetime import datetime
 
+import mapreduce
 from Author import Author
-from Document import Document, RedditDocument, ArxivDocument
+from profiling import stage, count, timed
+from Document import Document, RedditDocument, ArxivDocument, SpeechDocument, SentenceDocument, UNKNOWN_DATE
+from regex_prefilter import fold, required_literals
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported lazily where needed
 
 
 class Corpus:
-    def __init__(self, nom: str):
+    def __init__(self, nom: str, dedup=None):
         self.nom = nom
         self.authors: Dict[str, Author] = {}
         self.id2doc: Dict[int, Document] = {}
         self.ndoc = 0
         self.naut = 0
         self._next_id = 0
+        self._next_speech_id = 0
+
+        # TD8: parent speeches (sentences live in id2doc as SentenceDocument)
+        self.speeches: Dict[int, SpeechDocument] = {}
+
+        # optional dedup.Deduplicator consulted on every add
+        self.dedup = dedup
+
+        # optional timeseries.TermTimeSeries updated on every add
+        self.timeseries = None
 
         # TD6 cache: concatenated corpus string
         self._all_text_cache: Optional[str] = None
+        self._doc_starts: List[int] = []  # offset of each doc in it (+ end)
+        self._all_text_lower: Optional[str] = None
+
+    def __setstate__(self, state):
+        # pickles written before speeches / dedup / concordance offsets existed
+        self.__dict__.update(state)
+        self.__dict__.setdefault("speeches", {})
+        self.__dict__.setdefault("_next_speech_id", max(self.speeches, default=-1) + 1)
+        self.__dict__.setdefault("dedup", None)
+        self.__dict__.setdefault("timeseries", None)
+        self.__dict__.setdefault("_doc_starts", [])
+        self.__dict__.setdefault("_all_text_lower", None)
+        if not self._doc_starts:
+            self._all_text_cache = None
 
     # TD4/TD5: add documents
-    def add_document(self, document: Document) -> int:
+    def add_document(self, document: Document) -> Optional[int]:
+        """Returns the new doc id, or None if dedup dropped the document."""
+        return self._add(document)
+
+    def _add(self, document: Document, signature=None, keep: bool = False) -> Optional[int]:
+        dup_of = None
+        if self.dedup is not None:
+            dup_of, kind, sim = self.dedup.find(document.texte, signature)
+            if dup_of is not None and self.dedup.drop and not keep:
+                # duplicate not stored: recorded under the id it would have had
+                self.dedup.mark(self._next_id, dup_of, kind, sim)
+                self._next_id += 1
+                return None
+
         doc_id = self._next_id
         self._next_id += 1
 
+        if self.dedup is not None:
+            if dup_of is None:
+                self.dedup.add(doc_id, document.texte, signature)
+            else:
+                self.dedup.mark(doc_id, dup_of, kind, sim)
+
         self.id2doc[doc_id] = document
         self.ndoc = len(self.id2doc)
 
@@ -36,10 +87,51 @@ class Corpus:
             self.naut = len(self.authors)
         self.authors[a].add(doc_id, document)
 
+        if self.timeseries is not None:
+            self.timeseries.add(doc_id, document)
+
         # invalidate cache
         self._all_text_cache = None
         return doc_id
 
+    def add_documents(self, documents: List[Document], keep: bool = False) -> List[Optional[int]]:
+        """
+        Bulk add (ingestion batches). Returns the new doc ids, None for a
+        duplicate dropped by dedup (keep=True stores duplicates anyway, they
+        are only marked). With near-dedup, MinHash signatures are computed
+        for the whole batch at once.
+        """
+        if self.dedup is None or not self.dedup.near:
+            return [self._add(doc, keep=keep) for doc in documents]
+        sigs = self.dedup.signatures([doc.texte for doc in documents])
+        return [self._add(doc, sig, keep=keep) for doc, sig in zip(documents, sigs)]
+
+    def add_speech(self, speech: SpeechDocument) -> Optional[int]:
+        """
+        Register a parent speech and add one SentenceDocument per span.
+        Returns the speech id (key of self.speeches), or None if dedup dropped it.
+        Dedup works at the speech level: a duplicate speech (same or nearly
+        the same full text, e.g. the same CSV loaded twice) is skipped with
+        all its sentences. Sentences of a kept speech are never dropped (a
+        speech must keep all its sentences); repeated ones are only marked,
+        and SearchEngine(unique_texts=True) indexes their text once.
+        """
+        speech_id = self._next_speech_id
+        self._next_speech_id += 1
+        if self.dedup is not None:
+            dup_of, kind, sim = self.dedup.find(speech.texte, speech=True)
+            if dup_of is None:
+                self.dedup.add(speech_id, speech.texte, speech=True)
+            else:
+                self.dedup.mark(speech_id, dup_of, kind, sim, speech=True)
+                if self.dedup.drop:
+                    return None
+        self.speeches[speech_id] = speech
+        speech.doc_ids = self.add_documents(
+            [SentenceDocument(speech, speech_id, i) for i in range(len(speech.spans))], keep=True
+        )
+        return speech_id
+
     # TD4: sorting display
     def afficher_par_date(self, n: Optional[int] = None) -> None:
         items = sorted(self.id2doc.items(), key=lambda kv: kv[1].date)
@@ -57,6 +149,8 @@ class Corpus:
 
     # Save/Load (TD4)
     def to_dataframe(self) -> pd.DataFrame:
+        import pandas as pd
+
         rows = []
         for doc_id, doc in self.id2doc.items():
             row = {
@@ -86,54 +180,72 @@ class Corpus:
             raise ValueError("format_type must be 'csv' or 'pickle'")
 
     @classmethod
-    def load(cls, nom: str, filename: str, format_type: str = "csv") -> "Corpus":
+    def load(cls, nom: str, filename: str, format_type: str = "csv", dedup=None) -> "Corpus":
+        """
+        dedup: optional dedup.Deduplicator applied to the rows of a csv load
+        (a pickle comes back with the dedup state it was saved with).
+        """
         format_type = format_type.lower()
         if format_type == "pickle":
-            with open(filename, "rb") as f:
+            with stage("load.pickle"), open(filename, "rb") as f:
                 return pickle.load(f)
 
         if format_type != "csv":
             raise ValueError("format_type must be 'csv' or 'pickle'")
 
-        df = pd.read_csv(filename, sep="\t")
-        corpus = cls(nom)
-
-        for _, row in df.iterrows():
-            doc_type = str(row.get("type", "Document"))
-            titre = str(row.get("titre", ""))
-            auteur = str(row.get("auteur", ""))
-            url = str(row.get("url", ""))
-            texte = str(row.get("texte", ""))
-
-            date_str = str(row.get("date", ""))
-            try:
-                dt = datetime.fromisoformat(date_str.replace("Z", ""))
-            except ValueError:
-                dt = datetime.now()
-
-            if doc_type == "Reddit":
-                nb = int(row.get("nb_commentaires", 0))
-                doc = RedditDocument(titre, auteur, dt, url, texte, nb_commentaires=nb)
-            elif doc_type == "Arxiv":
-                co_str = str(row.get("co_auteurs", "")).strip()
-                co = co_str.split(";") if co_str else []
-                doc = ArxivDocument(titre, auteur, dt, url, texte, co_auteurs=co)
-            else:
-                doc = Document(titre, auteur, dt, url, texte)
+        import pandas as pd
 
-            corpus.add_document(doc)
+        with stage("load.read_csv"):
+            df = pd.read_csv(filename, sep="\t")
+        corpus = cls(nom, dedup=dedup)
+
+        with stage("load.documents"):
+            corpus.add_documents([cls.document_from_row(row) for _, row in df.iterrows()])
+        count("load.docs", corpus.ndoc)
 
         return corpus
 
+    @staticmethod
+    def document_from_row(row) -> Document:
+        """One row of a saved TSV (to_dataframe columns) back to a Document."""
+        doc_type = str(row.get("type", "Document"))
+        titre = str(row.get("titre", ""))
+        auteur = str(row.get("auteur", ""))
+        url = str(row.get("url", ""))
+        texte = str(row.get("texte", ""))
+
+        date_str = str(row.get("date", ""))
+        try:
+            dt = datetime.fromisoformat(date_str.replace("Z", ""))
+        except ValueError:
+            dt = UNKNOWN_DATE
+
+        if doc_type == "Reddit":
+            nb = int(row.get("nb_commentaires", 0))
+            return RedditDocument(titre, auteur, dt, url, texte, nb_commentaires=nb)
+        if doc_type == "Arxiv":
+            co_str = str(row.get("co_auteurs", "")).strip()
+            co = co_str.split(";") if co_str else []
+            return ArxivDocument(titre, auteur, dt, url, texte, co_auteurs=co)
+        return Document(titre, auteur, dt, url, texte)
+
     # TD6
 
     def _build_all_text_once(self) -> str:
         """Build the concatenated corpus text only once, and cache it."""
         if self._all_text_cache is None:
+            count("corpus.all_text_cache.miss")
             # concat all docs with separators to avoid merging words
-            self._all_text_cache = "\n".join(
-                str(doc.texte) for doc in self.id2doc.values()
-            )
+            with stage("corpus.all_text"):
+                texts = [str(doc.texte) for doc in self.id2doc.values()]
+                self._all_text_cache = "\n".join(texts)
+                starts = [0]
+                for t in texts:
+                    starts.append(starts[-1] + len(t) + 1)
+                self._doc_starts = starts
+                self._all_text_lower = None
+        else:
+            count("corpus.all_text_cache.hit")
         return self._all_text_cache
 
     @staticmethod
@@ -169,12 +281,15 @@ class Corpus:
         pattern = re.compile(rf".{{0,40}}\b{re.escape(keyword)}\b.{{0,40}}", flags)
         return pattern.findall(text)
 
+    @timed("corpus.concorde")
     def concorde(self, expr: str, context: int = 30, ignore_case: bool = True) -> pd.DataFrame:
         """
         TD6 1.2: Build a concordancer for an expression.
         Returns a pandas DataFrame with:
         contexte gauche | motif trouvé | contexte droit
         """
+        import pandas as pd
+
         if not expr:
             return pd.DataFrame(columns=["contexte gauche", "motif trouvé", "contexte droit"])
 
@@ -182,46 +297,83 @@ class Corpus:
         flags = re.IGNORECASE if ignore_case else 0
         pattern = re.compile(expr, flags)
 
-        rows = []
-        for m in pattern.finditer(text):
-            start, end = m.span()
-            left = text[max(0, start - context):start]
-            mid = text[start:end]
-            right = text[end:min(len(text), end + context)]
-            rows.append({
-                "contexte gauche": left,
-                "motif trouvé": mid,
-                "contexte droit": right
-            })
-
-        return pd.DataFrame(rows, columns=["contexte gauche", "motif trouvé", "contexte droit"])
+        # literal prefilter: run the regex only on documents holding its required literals
+        spans = None
+        prefilter = required_literals(pattern)
+        if prefilter is not None:
+            spans = self._candidate_spans(*prefilter)
+        if spans is None:
+            spans = [(0, len(text))]
+        count("concorde.spans", len(spans))
+
+        left_col, mid_col, right_col = [], [], []
+        for lo, hi in spans:
+            for m in pattern.finditer(text, lo, hi):
+                start, end = m.span()
+                left_col.append(text[max(0, start - context):start])
+                mid_col.append(text[start:end])
+                right_col.append(text[end:min(len(text), end + context)])
+
+        return pd.DataFrame({
+            "contexte gauche": left_col,
+            "motif trouvé": mid_col,
+            "contexte droit": right_col,
+        }, columns=["contexte gauche", "motif trouvé", "contexte droit"])
+
+    def _candidate_spans(self, reqs, casefold: bool) -> Optional[List[Tuple[int, int]]]:
+        """
+        (start, end) spans of the concatenated text covering the documents that
+        contain every required literal group; consecutive documents are merged.
+        Literals are found with str.find on the (case-folded) text, jumping to the
+        next document after each hit. None if the fast path does not apply.
+        """
+        text = self._build_all_text_once()
+        if casefold:
+            if self._all_text_lower is None:
+                # same folding as the literals; "" if offsets would not stay valid
+                self._all_text_lower = fold(text) or ""
+            hay = self._all_text_lower
+            if text and not hay:
+                return None
+        else:
+            hay = text
+        starts = self._doc_starts
+
+        docs = set()
+        for lit in reqs[0]:
+            pos = hay.find(lit)
+            while pos != -1:
+                d = bisect_right(starts, pos) - 1
+                docs.add(d)
+                pos = hay.find(lit, starts[d + 1])
+        docs = sorted(docs)
+        for group in reqs[1:]:
+            docs = [d for d in docs
+                    if any(hay.find(lit, starts[d], starts[d + 1] - 1) != -1 for lit in group)]
+
+        spans: List[Tuple[int, int]] = []
+        for d in docs:
+            lo, hi = starts[d], starts[d + 1] - 1
+            if spans and spans[-1][1] + 1 == lo:
+                spans[-1] = (spans[-1][0], hi)
+            else:
+                spans.append((lo, hi))
+        return spans
 
-    def stats(self, n: int = 20) -> pd.DataFrame:
+    @timed("corpus.stats")
+    def stats(self, n: int = 20, processes: Optional[int] = None) -> pd.DataFrame:
         """
         TD6 2.x:
         - number of distinct words
         - top-n most frequent words
         Builds a freq table using pandas.
         Returns the freq DataFrame (sorted).
+        processes > 1 counts document chunks in a process pool (mapreduce.run).
         """
-        # Build vocabulary + counts in one pass over documents 
-        counts: Dict[str, int] = {}
-        doc_freq: Dict[str, int] = {}
-
-        for doc in self.id2doc.values():
-            cleaned = self.nettoyer_texte(doc.texte)
-            if not cleaned:
-                continue
-            tokens = cleaned.split()
-
-            # term frequency
-            for w in tokens:
-                counts[w] = counts.get(w, 0) + 1
+        import pandas as pd
 
-            # document frequency
-            unique = set(tokens)
-            for w in unique:
-                doc_freq[w] = doc_freq.get(w, 0) + 1
+        # Build vocabulary + counts in one pass over documents
+        counts, doc_freq = mapreduce.run(self, mapreduce.TokenCounts(), processes=processes)
 
         vocab_size = len(counts)
         print(f"Nombre de mots différents dans le corpus : {vocab_size}")
@@ -2,11 +2,19 @@
 from __future__ import annotations
 
 from datetime import datetime, date as date_class
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Tuple
+
+# date inconnue (non parsable) : datetime.min plutôt que datetime.now(), pour
+# ne pas polluer la période courante dans les analyses temporelles
+UNKNOWN_DATE = datetime.min
+
+
+def is_unknown_date(value: Any) -> bool:
+    return not isinstance(value, datetime) or value == UNKNOWN_DATE
 
 
 def _to_datetime(value: Any) -> datetime:
-    """Convertit différentes représentations en datetime."""
+    """Convertit différentes représentations en datetime (UNKNOWN_DATE sinon)."""
     if isinstance(value, datetime):
         return value
     if isinstance(value, date_class):
@@ -22,8 +30,8 @@ def _to_datetime(value: Any) -> datetime:
         try:
             return datetime.strptime(s[:10], "%Y-%m-%d")
         except ValueError:
-            return datetime.now()
-    return datetime.now()
+            return UNKNOWN_DATE
+    return UNKNOWN_DATE
 
 
 class Document:
@@ -115,3 +123,70 @@ class DocumentFactory:
         if s == "arxiv":
             return ArxivDocument(titre, auteur, date, url, texte, co_auteurs=co_auteurs or [])
         return Document(titre, auteur, date, url, texte)
+
+
+class SpeechDocument(Document):
+    """
+    Discours complet (document parent). Porte les métadonnées partagées ;
+    les phrases sont stockées comme intervalles (start, end) dans `texte`.
+    """
+
+    def __init__(self, titre: str, auteur: str, date, url: str, texte: str,
+                 spans: Optional[List[Tuple[int, int]]] = None):
+        super().__init__(titre, auteur, date, url, texte)
+        self.type = "Speech"
+        self.spans: List[Tuple[int, int]] = list(spans) if spans else []
+        self.doc_ids: List[int] = []  # ids des phrases dans le Corpus
+
+    def getType(self) -> str:
+        return "Speech"
+
+    def sentence(self, index: int) -> str:
+        start, end = self.spans[index]
+        return self.texte[start:end].replace("\n", " ")
+
+    def __str__(self) -> str:
+        return f"[{self.getType()}] {self.titre} — phrases : {len(self.spans)}"
+
+
+class SentenceDocument(Document):
+    """
+    Phrase d'un SpeechDocument (document enfant). Ne stocke que la référence
+    au parent et son index : titre, auteur, date, url et texte sont lus
+    dans le parent (pas de copie).
+    """
+
+    def __init__(self, parent: SpeechDocument, parent_id: int, index: int):
+        self.parent = parent
+        self.parent_id = parent_id
+        self.index = index
+
+    @property
+    def titre(self) -> str:
+        return self.parent.titre or f"Speech sentence #{self.index + 1}"
+
+    @property
+    def auteur(self) -> str:
+        return self.parent.auteur
+
+    @property
+    def date(self) -> datetime:
+        return self.parent.date
+
+    @property
+    def url(self) -> str:
+        return self.parent.url
+
+    @property
+    def texte(self) -> str:
+        return self.parent.sentence(self.index)
+
+    @property
+    def type(self) -> str:
+        return "Sentence"
+
+    def getType(self) -> str:
+        return "Sentence"
+
+    def __repr__(self) -> str:
+        return f"SentenceDocument(parent_id={self.parent_id}, index={self.index})"
@@ -1,11 +1,18 @@
 # SearchEngine.py
+from __future__ import annotations
 
 import math
+from collections import Counter
+from typing import TYPE_CHECKING
+
 import numpy as np
-import pandas as pd
 from scipy.sparse import csr_matrix
 
 from Corpus import Corpus
+from profiling import stage, count
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported lazily: result frames only
 
 
 class SearchEngine:
@@ -14,17 +21,38 @@ class SearchEngine:
     - takes a Corpus in constructor
     - builds vocab + mat_TF + mat_TFxIDF immediately
     - provides search(query, top_n) returning a pandas DataFrame
+    - unique_texts=True: documents with the same cleaned text share one row
+      (self.row_members[i] lists all doc ids of row i, idf counts unique texts)
+    - queries are scored against L2-normalized copies of the matrices
+      (normalized()), computed once, through the columns of the query terms only
+    - more_like_this(doc_id) / feedback(query, relevant, non_relevant) reuse
+      indexed TF-IDF rows as queries (pruned to their top-weighted terms)
     """
 
-    def __init__(self, corpus: Corpus):
+    def __init__(self, corpus: Corpus, unique_texts: bool = False):
         self.corpus = corpus
+        self.unique_texts = unique_texts
         self.doc_ids = sorted(corpus.id2doc.keys())
+        self.row_members = [[doc_id] for doc_id in self.doc_ids]
         self.N = len(self.doc_ids)
 
         # Build vocab and matrices
         self.vocab = {}  # word -> {"id": int, "tf": int, "df": int, "idf": float}
         self.mat_TF = None
         self.mat_TFxIDF = None
+        self._normalized = {}  # use_tfidf -> (CSR, CSC) with unit rows
+
+        # TD8: speech x sentence indicator matrix (parent/child documents)
+        self.parent_ids = []
+        self.mat_parent = None
+
+        # TD8: prefix/fuzzy helpers, built on first use
+        self._autocomplete = None
+
+        # more_like_this: doc id -> row, request counts, row -> (rows, scores) k-NN cache
+        self._row_of = None
+        self.mlt_requests = Counter()
+        self._knn = {}
 
         self._build()
 
@@ -34,139 +62,446 @@ class SearchEngine:
 
     def _build(self):
         # 1) Build vocabulary + per-doc counts 
-        word_set = set()
-        docs_tokens = []
-
-        for doc_id in self.doc_ids:
-            tokens = self._tokenize(self.corpus.id2doc[doc_id].texte)
-            docs_tokens.append(tokens)
-            word_set.update(tokens)
-
-        # Sort alphabetically
-        words = sorted(word_set)
-        for idx, w in enumerate(words):
-            self.vocab[w] = {"id": idx, "tf": 0, "df": 0, "idf": 0.0}
+        with stage("build.tokenize"):
+            word_set = set()
+            docs_tokens = []
+
+            if self.unique_texts:
+                row_of_text = {}
+                self.row_members = []
+                for doc_id in self.doc_ids:
+                    tokens = self._tokenize(self.corpus.id2doc[doc_id].texte)
+                    key = " ".join(tokens)
+                    i = row_of_text.get(key)
+                    if i is None:
+                        row_of_text[key] = len(docs_tokens)
+                        self.row_members.append([doc_id])
+                        docs_tokens.append(tokens)
+                        word_set.update(tokens)
+                    else:
+                        self.row_members[i].append(doc_id)
+                self.doc_ids = [members[0] for members in self.row_members]
+                self.N = len(self.doc_ids)
+            else:
+                for doc_id in self.doc_ids:
+                    tokens = self._tokenize(self.corpus.id2doc[doc_id].texte)
+                    docs_tokens.append(tokens)
+                    word_set.update(tokens)
+
+        with stage("build.vocab"):
+            # Sort alphabetically
+            words = sorted(word_set)
+            for idx, w in enumerate(words):
+                self.vocab[w] = {"id": idx, "tf": 0, "df": 0, "idf": 0.0}
 
         # 2) Build sparse TF matrix
-        rows = []
-        cols = []
-        data = []
+        with stage("build.tf_matrix"):
+            rows = []
+            cols = []
+            data = []
 
-        for i, tokens in enumerate(docs_tokens):
-            if not tokens:
-                continue
+            for i, tokens in enumerate(docs_tokens):
+                if not tokens:
+                    continue
 
-            local_counts = {}
-            for w in tokens:
-                local_counts[w] = local_counts.get(w, 0) + 1
+                local_counts = {}
+                for w in tokens:
+                    local_counts[w] = local_counts.get(w, 0) + 1
 
-            # doc frequency update (once per doc)
-            for w in local_counts.keys():
-                self.vocab[w]["df"] += 1
+                # doc frequency update (once per doc)
+                for w in local_counts.keys():
+                    self.vocab[w]["df"] += 1
 
-            # fill sparse data
-            for w, c in local_counts.items():
-                j = self.vocab[w]["id"]
-                rows.append(i)
-                cols.append(j)
-                data.append(c)
+                # fill sparse data
+                for w, c in local_counts.items():
+                    j = self.vocab[w]["id"]
+                    rows.append(i)
+                    cols.append(j)
+                    data.append(c)
 
-        V = len(self.vocab)
-        self.mat_TF = csr_matrix((data, (rows, cols)), shape=(self.N, V), dtype=float)
+            V = len(self.vocab)
+            self.mat_TF = csr_matrix((data, (rows, cols)), shape=(self.N, V), dtype=float)
 
         # 3) Compute total term frequency per word (corpus tf)
         # sum over docs for each column
-        col_sums = np.asarray(self.mat_TF.sum(axis=0)).ravel()
+        with stage("build.idf"):
+            col_sums = np.asarray(self.mat_TF.sum(axis=0)).ravel()
+            for w, info in self.vocab.items():
+                info["tf"] = int(col_sums[info["id"]])
+
+            # 4) Compute IDF + TFxIDF matrix
+            self._apply_idf(self.N, {})
+
+        # 5) Parent mapping: row p of mat_parent has a 1 for each sentence of speech p
+        with stage("build.parents"):
+            self._build_parents()
+        count("build.docs", self.N)
+        count("build.nnz", self.mat_TF.nnz)
+
+    def _apply_idf(self, n_docs: int, df_override):
+        """
+        idf = log((N + 1) / (df + 1)) + 1  (smooth), then mat_TFxIDF = mat_TF * idf.
+        df_override gives the df of some words (global statistics), others use vocab df.
+        """
+        idf = np.zeros(len(self.vocab), dtype=float)
         for w, info in self.vocab.items():
-            info["tf"] = int(col_sums[info["id"]])
-
-        # 4) Compute IDF + TFxIDF matrix
-        # idf = log((N + 1) / (df + 1)) + 1  (smooth)
-        idf = np.zeros(V, dtype=float)
-        for w, info in self.vocab.items():
-            df = info["df"]
-            val = math.log((self.N + 1) / (df + 1)) + 1.0
+            df = df_override.get(w, info["df"])
+            val = math.log((n_docs + 1) / (df + 1)) + 1.0
             info["idf"] = float(val)
             idf[info["id"]] = val
 
         # multiply each column by its idf
         self.mat_TFxIDF = self.mat_TF.multiply(idf)
+        self._normalized = {}
+        self._knn = {}
+
+    def normalized(self, use_tfidf: bool = True):
+        """
+        (CSR, CSC) copies of mat_TFxIDF (or mat_TF) with L2-normalized rows,
+        built on first use: cosine similarity is then a plain dot product.
+        """
+        pair = self._normalized.get(use_tfidf)
+        if pair is None:
+            with stage("search.normalize"):
+                mat = csr_matrix(self.mat_TFxIDF if use_tfidf else self.mat_TF, dtype=float, copy=True)
+                norms = np.sqrt(np.asarray(mat.multiply(mat).sum(axis=1)).ravel())
+                norms[norms == 0] = 1.0
+                mat.data /= np.repeat(norms, np.diff(mat.indptr))
+                pair = (mat, mat.tocsc())
+            self._normalized[use_tfidf] = pair
+        return pair
+
+    def set_collection_stats(self, n_docs: int, doc_freq) -> None:
+        """
+        Sharded mode: recompute idf and mat_TFxIDF from collection-wide
+        N and df (word -> df) so scores match a single engine over all shards.
+        """
+        self._apply_idf(n_docs, doc_freq)
+
+    def _build_parents(self):
+        parent_rows = []
+        sent_rows = []
+        for i, members in enumerate(self.row_members):
+            for doc_id in members:
+                parent_id = getattr(self.corpus.id2doc[doc_id], "parent_id", None)
+                if parent_id is not None:
+                    parent_rows.append(parent_id)
+                    sent_rows.append(i)
+
+        self.parent_ids = sorted(set(parent_rows))
+        pos = {p: k for k, p in enumerate(self.parent_ids)}
+        self.mat_parent = csr_matrix(
+            (np.ones(len(sent_rows)), ([pos[p] for p in parent_rows], sent_rows)),
+            shape=(len(self.parent_ids), self.N),
+        )
+        # a shared row counts once per speech
+        self.mat_parent.data[:] = 1.0
+
+    @property
+    def autocomplete(self):
+        if self._autocomplete is None:
+            from autocomplete import Autocomplete
+            self._autocomplete = Autocomplete(self)
+        return self._autocomplete
+
+    def complete(self, prefix: str, n: int = 10):
+        """TD8: vocabulary words starting with `prefix`, by decreasing df."""
+        return self.autocomplete.complete(prefix, n=n)
+
+    def correct_query(self, query: str, max_dist: int = 2) -> str:
+        """TD8: query with misspelled (out-of-vocabulary) words corrected."""
+        return self.autocomplete.correct_query(query, max_dist=max_dist)
 
     def _query_vector(self, query: str, use_tfidf: bool = True):
-        tokens = self._tokenize(query)
+        """
+        Sparse unit query vector as (column ids, weights), or None for an
+        empty query. Words outside the vocabulary are ignored.
+        """
+        with stage("search.tokenize"):
+            tokens = self._tokenize(query)
         if not tokens:
             return None
 
-        V = len(self.vocab)
-        q = np.zeros(V, dtype=float)
-
-        # TF in query
-        for w in tokens:
-            if w in self.vocab:
-                j = self.vocab[w]["id"]
-                q[j] += 1.0
-
-        if use_tfidf:
-            # multiply by idf
-            for w in set(tokens):
-                if w in self.vocab:
-                    j = self.vocab[w]["id"]
-                    q[j] *= self.vocab[w]["idf"]
+        with stage("search.query_vector"):
+            # TF in query
+            tf = {}
+            for w in tokens:
+                info = self.vocab.get(w)
+                if info is not None:
+                    tf[w] = tf.get(w, 0) + 1
+
+            cols = np.array([self.vocab[w]["id"] for w in tf], dtype=np.int64)
+            q = np.array(list(tf.values()), dtype=float)
+            if use_tfidf:
+                # multiply by idf
+                q *= np.array([self.vocab[w]["idf"] for w in tf], dtype=float)
+
+            # normalize for cosine similarity
+            norm = np.linalg.norm(q)
+            if norm > 0:
+                q /= norm
+        count("search.query_terms", len(tokens))
+        return cols, q
+
+    def _scores(self, keywords: str, use_tfidf: bool = True, show_progress: bool = False):
+        """Cosine score of every row for the query, or None if the query is empty."""
+        query = self._query_vector(keywords, use_tfidf=use_tfidf)
+        if query is None:
+            return None
+        return self._score_columns(*query, use_tfidf=use_tfidf, show_progress=show_progress)
+
+    def _score_columns(self, cols, q, use_tfidf: bool = True, show_progress: bool = False):
+        """Scores of every row for the sparse unit query (cols, q)."""
+        _, csc = self.normalized(use_tfidf)
+
+        with stage("search.matmul"):
+            # N x k: postings of the query terms only
+            sub = csc[:, cols]
+
+            if show_progress:
+                from tqdm import tqdm
+
+                # chunked scoring with tqdm (TD8 requirement)
+                sub = sub.tocsr()
+                scores = np.empty(self.N, dtype=float)
+                step = max(1, -(-self.N // 100))
+                for start in tqdm(range(0, self.N, step), desc="Searching", unit="chunk"):
+                    scores[start:start + step] = sub[start:start + step] @ q
+            else:
+                scores = sub @ q
+        count("search.docs_scored", self.N)
+        count("search.nnz_touched", sub.nnz)
+
+        return scores
+
+    def search(self, keywords: str, top_n: int = 10, use_tfidf: bool = True, show_progress: bool = False,
+               fuzzy: bool = False) -> pd.DataFrame:
+        """
+        TD7: returns a pandas DataFrame of best results.
+        TD8 2.3: if show_progress=True, uses tqdm to show progress during scoring loop.
+        fuzzy=True: unknown words are replaced by their closest vocabulary word.
+        """
+        import pandas as pd
+
+        if fuzzy:
+            with stage("search.fuzzy"):
+                keywords = self.correct_query(keywords)
+
+        if self.N == 0:
+            return pd.DataFrame(columns=["doc_id", "score", "titre", "auteur", "date", "type", "url"])
+
+        scores = self._scores(keywords, use_tfidf=use_tfidf, show_progress=show_progress)
+        if scores is None:
+            return pd.DataFrame(columns=["doc_id", "score", "titre", "auteur", "date", "type", "url"])
+
+        with stage("search.argsort"):
+            order = np.argsort(-scores)[:top_n]
+
+        with stage("search.dataframe"):
+            return self._results_frame(order, scores)
+
+    # More like this / relevance feedback
+
+    def row_of(self, doc_id: int) -> int:
+        """Matrix row of a document (shared row when unique_texts=True)."""
+        if self._row_of is None:
+            self._row_of = {d: i for i, members in enumerate(self.row_members) for d in members}
+        try:
+            return self._row_of[doc_id]
+        except KeyError:
+            raise KeyError(f"unknown doc_id: {doc_id}") from None
+
+    @staticmethod
+    def _prune(cols, weights, max_terms: int):
+        """Keep the max_terms largest weights, renormalized to a unit vector."""
+        if max_terms and len(weights) > max_terms:
+            keep = np.argpartition(-weights, max_terms - 1)[:max_terms]
+            cols, weights = cols[keep], weights[keep]
+        norm = np.linalg.norm(weights)
+        return cols, (weights / norm if norm > 0 else weights)
+
+    def _row_query(self, row: int, max_terms: int):
+        csr, _ = self.normalized(use_tfidf=True)
+        start, end = csr.indptr[row], csr.indptr[row + 1]
+        return self._prune(csr.indices[start:end], csr.data[start:end], max_terms)
+
+    def _top_rows(self, scores, top_n: int, exclude=()):
+        scores = scores.copy()
+        scores[list(exclude)] = -np.inf
+        k = min(top_n, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def more_like_this(self, doc_id: int, top_n: int = 10, max_terms: int = 25) -> pd.DataFrame:
+        """
+        Documents most similar to doc_id: its TF-IDF row, pruned to the
+        max_terms heaviest terms, is scored like a query (the document itself
+        is excluded). Served from the k-NN cache when build_knn() covered it.
+        """
+        row = self.row_of(doc_id)
+        self.mlt_requests[doc_id] += 1
+
+        cached = self._knn.get(row)
+        if cached is not None and cached[2] == max_terms and len(cached[0]) >= min(top_n, self.N - 1):
+            count("mlt.knn_hit")
+            rows, scores = cached[0][:top_n], cached[1][:top_n]
+            return self._results_frame(rows, dict(zip(rows, scores)))
+
+        with stage("search.mlt"):
+            scores = self._score_columns(*self._row_query(row, max_terms))
+            order = self._top_rows(scores, top_n, exclude=[row])
+        return self._results_frame(order, scores)
+
+    def feedback(self, keywords: str, relevant=(), non_relevant=(), top_n: int = 10,
+                 alpha: float = 1.0, beta: float = 0.75, gamma: float = 0.15,
+                 max_terms: int = 50) -> pd.DataFrame:
+        """
+        Rocchio relevance feedback:
+        q' = alpha * q + beta * mean(relevant rows) - gamma * mean(non-relevant rows)
+        (unit TF-IDF rows from the index; negative weights dropped, pruned to
+        max_terms). Documents already judged are left out of the results.
+        """
+        import pandas as pd
+
+        cols, weights = [], []
+        query = self._query_vector(keywords) if keywords else None
+        if query is not None:
+            cols.append(query[0])
+            weights.append(alpha * query[1])
+
+        csr, _ = self.normalized(use_tfidf=True)
+        judged = []
+        for doc_ids, coef in ((relevant, beta), (non_relevant, -gamma)):
+            rows = sorted({self.row_of(d) for d in doc_ids})
+            judged.extend(rows)
+            for r in rows:
+                start, end = csr.indptr[r], csr.indptr[r + 1]
+                cols.append(csr.indices[start:end])
+                weights.append(coef / len(rows) * csr.data[start:end])
+
+        all_cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        if len(all_cols) == 0:
+            return pd.DataFrame(columns=["doc_id", "score", "titre", "auteur", "date", "type", "url"])
+
+        # sum the weights of each term, keep the positive ones
+        terms, inverse = np.unique(all_cols, return_inverse=True)
+        summed = np.bincount(inverse, weights=np.concatenate(weights))
+        positive = summed > 0
+        q_cols, q = self._prune(terms[positive], summed[positive], max_terms)
+
+        with stage("search.feedback"):
+            scores = self._score_columns(q_cols, q)
+            order = self._top_rows(scores, top_n, exclude=judged)
+        return self._results_frame(order, scores)
+
+    def build_knn(self, doc_ids=None, k: int = 10, max_terms: int = 25, most_requested: int = 100,
+                  batch: int = 64) -> int:
+        """
+        Precompute the k nearest neighbours (more_like_this results) of doc_ids,
+        by default the `most_requested` documents seen by more_like_this.
+        Rows are scored in batches with one sparse product each. Returns the
+        number of cached documents.
+        """
+        if doc_ids is None:
+            doc_ids = [d for d, _ in self.mlt_requests.most_common(most_requested)]
+        rows = sorted({self.row_of(d) for d in doc_ids})
+        _, csc = self.normalized(use_tfidf=True)
+
+        with stage("search.build_knn"):
+            for b in range(0, len(rows), batch):
+                block = rows[b:b + batch]
+                q_rows, q_cols, q_vals = [], [], []
+                for j, r in enumerate(block):
+                    cols, q = self._row_query(r, max_terms)
+                    q_rows.append(cols)
+                    q_cols.append(np.full(len(cols), j))
+                    q_vals.append(q)
+                Q = csr_matrix((np.concatenate(q_vals), (np.concatenate(q_rows), np.concatenate(q_cols))),
+                               shape=(csc.shape[1], len(block)))
+                S = (csc @ Q).toarray()  # N x batch
+                for j, r in enumerate(block):
+                    order = self._top_rows(S[:, j], k, exclude=[r])
+                    self._knn[r] = (order, S[order, j], max_terms)
+        return len(rows)
+
+    def _results_frame(self, order, scores) -> pd.DataFrame:
+        import pandas as pd
 
-        # normalize for cosine similarity
-        norm = np.linalg.norm(q)
-        if norm > 0:
-            q = q / norm
-        return q
+        rows = []
+        for i in order:
+            doc_id = self.doc_ids[i]
+            doc = self.corpus.id2doc[doc_id]
+            rows.append({
+                "doc_id": doc_id,
+                "score": float(scores[i]),
+                "titre": doc.titre,
+                "auteur": doc.auteur,
+                "date": doc.date.isoformat(),
+                "type": doc.getType(),
+                "url": doc.url,
+            })
+            if self.unique_texts:
+                rows[-1]["n_doublons"] = len(self.row_members[i]) - 1
+
+        return pd.DataFrame(rows)
+
+    def _member_of(self, row: int, parent_id: int) -> int:
+        """Doc id of the sentence of speech parent_id in a (possibly shared) row."""
+        for doc_id in self.row_members[row]:
+            if getattr(self.corpus.id2doc[doc_id], "parent_id", None) == parent_id:
+                return doc_id
+        return self.doc_ids[row]
+
+    def search_speeches(self, keywords: str, top_n: int = 10, pooling: str = "max",
+                        use_tfidf: bool = True) -> pd.DataFrame:
+        """
+        TD8: rank sentences, then aggregate their scores per parent speech.
+        pooling: 'max' (best sentence) or 'sum' (all sentences).
+        Aggregation is a sparse product with the speech x sentence matrix.
+        """
+        import pandas as pd
+
+        cols = ["speech_id", "score", "n_phrases", "best_doc_id", "extrait",
+                "titre", "auteur", "date", "url"]
+        if pooling not in ("max", "sum"):
+            raise ValueError("pooling must be 'max' or 'sum'")
+        if self.mat_parent is None or self.mat_parent.shape[0] == 0:
+            return pd.DataFrame(columns=cols)
+
+        scores = self._scores(keywords, use_tfidf=use_tfidf)
+        if scores is None:
+            return pd.DataFrame(columns=cols)
+
+        with stage("search.pooling"):
+            per_sentence = self.mat_parent.multiply(scores).tocsr()
+            best = np.asarray(per_sentence.argmax(axis=1)).ravel()
+            if pooling == "max":
+                agg = per_sentence.max(axis=1).toarray().ravel()
+            else:
+                agg = np.asarray(per_sentence.sum(axis=1)).ravel()
+
+        order = np.argsort(-agg)[:top_n]
+        n_sent = np.diff(self.mat_parent.indptr)
 
-    def search(self, keywords: str, top_n: int = 10, use_tfidf: bool = True, show_progress: bool = False) -> pd.DataFrame:
-    """
-    TD7: returns a pandas DataFrame of best results.
-    TD8 2.3: if show_progress=True, uses tqdm to show progress during scoring loop.
-    """
-    from tqdm import tqdm
-
-    if self.N == 0:
-        return pd.DataFrame(columns=["doc_id", "score", "titre", "auteur", "date", "type", "url"])
-
-    q = self._query_vector(keywords, use_tfidf=use_tfidf)
-    if q is None:
-        return pd.DataFrame(columns=["doc_id", "score", "titre", "auteur", "date", "type", "url"])
-
-    mat = self.mat_TFxIDF if use_tfidf else self.mat_TF
-
-    # normalize docs for cosine similarity
-    import numpy as np
-    doc_norms = np.sqrt(mat.multiply(mat).sum(axis=1)).A1
-    doc_norms[doc_norms == 0] = 1.0
-
-    scores = np.zeros(self.N, dtype=float)
-
-    if show_progress:
-        # loop scoring with tqdm (TD8 requirement)
-        for i in tqdm(range(self.N), desc="Searching"):
-            row = mat.getrow(i)
-            # cosine similarity: (row·q) / ||row||
-            scores[i] = (row.dot(q) / doc_norms[i]).sum()
-    else:
-        # fast vectorized
-        mat_normed = mat.multiply(1.0 / doc_norms[:, None])
-        scores = np.asarray(mat_normed.dot(q)).ravel()
-
-    order = np.argsort(-scores)[:top_n]
-
-    rows = []
-    for i in order:
-        doc_id = self.doc_ids[i]
-        doc = self.corpus.id2doc[doc_id]
-        rows.append({
-            "doc_id": doc_id,
-            "score": float(scores[i]),
-            "titre": doc.titre,
-            "auteur": doc.auteur,
-            "date": doc.date.isoformat(),
-            "type": doc.getType(),
-            "url": doc.url,
-        })
-
-    return pd.DataFrame(rows)
+        rows = []
+        for p in order:
+            if agg[p] <= 0:
+                break
+            speech_id = self.parent_ids[p]
+            speech = self.corpus.speeches[speech_id]
+            best_doc_id = self._member_of(best[p], speech_id)
+            rows.append({
+                "speech_id": speech_id,
+                "score": float(agg[p]),
+                "n_phrases": int(n_sent[p]),
+                "best_doc_id": best_doc_id,
+                "extrait": self.corpus.id2doc[best_doc_id].texte,
+                "titre": speech.titre,
+                "auteur": speech.auteur,
+                "date": speech.date.isoformat(),
+                "url": speech.url,
+            })
+
+        return pd.DataFrame(rows, columns=cols)
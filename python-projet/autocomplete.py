@@ -0,0 +1,120 @@
+# autocomplete.py
+"""
+TD8: query-time helpers for the search box.
+- prefix completion: bisect over the sorted vocabulary, ranked by df
+- fuzzy matching: character-trigram index -> candidates -> edit distance
+
+Built once from a SearchEngine vocabulary; every lookup only touches the
+prefix range / the candidate lists, so it can run on each keystroke.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def _trigrams(word: str) -> List[str]:
+    w = f"$${word}$"
+    return [w[i:i + 3] for i in range(len(w) - 2)]
+
+
+def edit_distance(a: str, b: str, max_dist: Optional[int] = None) -> int:
+    """
+    Edit distance with adjacent transpositions (optimal string alignment);
+    stops early and returns max_dist + 1 once the distance exceeds max_dist.
+    """
+    if max_dist is not None and abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    before = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, before[j - 2] + 1)
+            cur.append(d)
+        if max_dist is not None and min(cur) > max_dist:
+            return max_dist + 1
+        before, prev = prev, cur
+    return prev[-1]
+
+
+class Autocomplete:
+    """Prefix completion and spelling correction over a SearchEngine vocabulary."""
+
+    def __init__(self, engine):
+        # vocab ids follow alphabetical order, so words[id] is sorted
+        items = sorted(engine.vocab.items(), key=lambda kv: kv[1]["id"])
+        self.words: List[str] = [w for w, _ in items]
+        self.df = np.array([info["df"] for _, info in items], dtype=np.int64)
+        self.lengths = np.array([len(w) for w in self.words], dtype=np.int32)
+        self._tokenize = engine._tokenize
+
+        grams: Dict[str, List[int]] = {}
+        for j, w in enumerate(self.words):
+            for g in set(_trigrams(w)):
+                grams.setdefault(g, []).append(j)
+        self.trigrams: Dict[str, np.ndarray] = {g: np.array(ids, dtype=np.int32) for g, ids in grams.items()}
+
+    def known(self, word: str) -> bool:
+        j = bisect_left(self.words, word)
+        return j < len(self.words) and self.words[j] == word
+
+    def _top_by_df(self, ids: np.ndarray, n: int) -> np.ndarray:
+        if len(ids) > n:
+            part = np.argpartition(-self.df[ids], n - 1)[:n]
+            ids = ids[part]
+        return ids[np.argsort(-self.df[ids], kind="stable")]
+
+    def complete(self, prefix: str, n: int = 10) -> List[Tuple[str, int]]:
+        """Words starting with `prefix`, most frequent (df) first."""
+        prefix = (prefix or "").lower().strip()
+        if not prefix or n <= 0:
+            return []
+        lo = bisect_left(self.words, prefix)
+        hi = bisect_left(self.words, prefix + "\uffff", lo)
+        ids = self._top_by_df(np.arange(lo, hi), n)
+        return [(self.words[j], int(self.df[j])) for j in ids]
+
+    def correct(self, term: str, n: int = 5, max_dist: int = 2, max_candidates: int = 25) -> List[Tuple[str, int, int]]:
+        """
+        Closest vocabulary words to `term`: list of (word, distance, df),
+        sorted by distance then df. Exact matches come back with distance 0.
+        """
+        term = (term or "").lower().strip()
+        if not term:
+            return []
+        lists = [self.trigrams[g] for g in set(_trigrams(term)) if g in self.trigrams]
+        if not lists:
+            return []
+
+        ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        # cheap filters before the edit distance: length gap and q-gram lemma
+        # (one edit removes at most 3 trigrams, an adjacent transposition 4)
+        grams_needed = len(set(_trigrams(term))) - 4 * max_dist
+        ok = (np.abs(self.lengths[ids] - len(term)) <= max_dist) & (shared >= grams_needed)
+        ids, shared = ids[ok], shared[ok]
+        if len(ids) > max_candidates:
+            keep = np.argpartition(-shared, max_candidates - 1)[:max_candidates]
+            ids = ids[keep]
+
+        out = []
+        for j in ids:
+            w = self.words[j]
+            d = edit_distance(term, w, max_dist)
+            if d <= max_dist:
+                out.append((w, d, int(self.df[j])))
+        out.sort(key=lambda t: (t[1], -t[2], t[0]))
+        return out[:n]
+
+    def correct_query(self, query: str, max_dist: int = 2) -> str:
+        """Replace out-of-vocabulary query words by their best correction."""
+        fixed = []
+        for tok in self._tokenize(query):
+            if self.known(tok):
+                fixed.append(tok)
+                continue
+            best = self.correct(tok, n=1, max_dist=max_dist)
+            fixed.append(best[0][0] if best else tok)
+        return " ".join(fixed)
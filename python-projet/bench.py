@@ -0,0 +1,381 @@
+# bench.py
+"""
+Benchmark harness for the corpus / search pipeline.
+
+    python bench.py --sizes 1000 10000 --discours ../data/discours_US.csv \
+        --save bench_baseline.json
+    python bench.py --sizes 1000 10000 --compare bench_baseline.json
+
+Each (size, case) runs in a fresh process (unless --no-isolate) and reports
+wall time (p50 / p99 / mean over repeats), peak RSS of the process and
+tracemalloc peak / live blocks of one extra traced run.
+Synthetic corpora are deterministic (seeded Zipf vocabulary), so baselines
+taken on the same machine are comparable.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from Corpus import Corpus
+from Document import DocumentFactory
+
+SOURCES = ("reddit", "arxiv", "document")
+QUERIES = ["america freedom", "economy jobs", "climate change", "health care",
+           "war", "tax cuts families", "president", "security border"]
+
+
+# Synthetic data
+
+def _vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    words = set()
+    while len(words) < size:
+        n = int(rng.integers(2, 10))
+        words.add("".join(rng.choice(letters, n)))
+    # real query words first so they get frequent ranks
+    head = [w for q in QUERIES for w in q.split()]
+    return head + sorted(words - set(head))
+
+
+def _sentences(n: int, words: List[str], rng: np.random.Generator, sent_len: int = 15) -> List[str]:
+    """n sentences of Zipf-distributed words."""
+    ranks = np.arange(1, len(words) + 1)
+    p = 1.0 / ranks
+    p /= p.sum()
+    lengths = rng.poisson(sent_len, n) + 1
+    picks = rng.choice(len(words), size=int(lengths.sum()), p=p)
+    out, pos = [], 0
+    for k in lengths:
+        out.append(" ".join(words[j] for j in picks[pos:pos + k]).capitalize() + ".")
+        pos += k
+    return out
+
+
+def synthetic_corpus(n_docs: int, seed: int = 0, vocab_size: int = 20000, sent_per_doc: int = 3) -> Corpus:
+    """Deterministic corpus of n_docs Reddit/Arxiv/plain documents over ~10 years."""
+    rng = np.random.default_rng(seed)
+    words = _vocabulary(vocab_size, rng)
+    sents = _sentences(n_docs * sent_per_doc, words, rng)
+    days = rng.integers(0, 3650, n_docs)
+    authors = [f"author{k}" for k in range(max(1, n_docs // 20))]
+    base = datetime(2010, 1, 1).timestamp()
+
+    corpus = Corpus(f"synthetic-{n_docs}")
+    for i in range(n_docs):
+        corpus.add_document(DocumentFactory.create(
+            source=SOURCES[i % 3],
+            titre=f"doc {i}",
+            auteur=authors[i % len(authors)],
+            date=base + 86400 * int(days[i]),
+            url=f"http://example.org/{i}",
+            texte=" ".join(sents[i * sent_per_doc:(i + 1) * sent_per_doc]),
+            nb_commentaires=i % 50,
+            co_auteurs=[authors[(i + 1) % len(authors)]],
+        ))
+    return corpus
+
+
+def synthetic_discours(path: str, n_sentences: int, seed: int = 0, per_speech: int = 200) -> str:
+    """Write a discours_US.csv-like TSV holding about n_sentences sentences."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    words = _vocabulary(20000, rng)
+    sents = _sentences(n_sentences, words, rng)
+    rows = []
+    for k, start in enumerate(range(0, n_sentences, per_speech)):
+        day = datetime.fromordinal(datetime(2015, 1, 1).toordinal() + k % 700)
+        rows.append({
+            "speaker": ("CLINTON", "TRUMP")[k % 2],
+            "text": " ".join(sents[start:start + per_speech]),
+            "date": day.strftime("%B %d, %Y"),
+            "descr": f"Speech {k}",
+            "link": f"http://example.org/speech/{k}",
+        })
+    pd.DataFrame(rows).to_csv(path, sep="\t", index=False)
+    return path
+
+
+# Fixtures (built lazily, once per process)
+
+class Fixture:
+    def __init__(self, size, workdir: str, discours: Optional[str] = None):
+        self.size = size
+        self.workdir = workdir
+        self.discours = discours
+        self._corpus = None
+        self._engine = None
+
+    def tmp(self, name: str) -> str:
+        return os.path.join(self.workdir, name)
+
+    def discours_path(self) -> str:
+        if self.size == "discours":
+            return self.discours
+        path = self.tmp(f"discours_{self.size}.tsv")
+        if not os.path.exists(path):
+            synthetic_discours(path, self.size)
+        return path
+
+    def corpus(self) -> Corpus:
+        if self._corpus is None:
+            if self.size == "discours":
+                from dataset_builders import build_corpus_from_discours_us
+                self._corpus = build_corpus_from_discours_us(self.discours)
+            else:
+                self._corpus = synthetic_corpus(self.size)
+        return self._corpus
+
+    def engine(self):
+        if self._engine is None:
+            from SearchEngine import SearchEngine
+            self._engine = SearchEngine(self.corpus())
+        return self._engine
+
+
+# Cases: setup(fixture) -> zero-argument callable to time
+
+CASES: Dict[str, tuple] = {}
+
+
+def case(name: str, repeat: int = 3):
+    def deco(fn):
+        CASES[name] = (fn, repeat)
+        return fn
+    return deco
+
+
+@case("build_corpus_from_discours_us", repeat=1)
+def _build_discours(fx):
+    from dataset_builders import build_corpus_from_discours_us
+    path = fx.discours_path()
+    return lambda: build_corpus_from_discours_us(path)
+
+
+def _save_case(fmt):
+    def setup(fx):
+        corpus = fx.corpus()
+        path = fx.tmp(f"corpus.{fmt}")
+        return lambda: corpus.save(path, format_type=fmt)
+    return setup
+
+
+def _load_case(fmt):
+    def setup(fx):
+        path = fx.tmp(f"corpus_load.{fmt}")
+        fx.corpus().save(path, format_type=fmt)
+        return lambda: Corpus.load("bench", path, format_type=fmt)
+    return setup
+
+
+for _fmt in ("csv", "pickle"):
+    case(f"corpus.save[{_fmt}]")(_save_case(_fmt))
+    case(f"corpus.load[{_fmt}]")(_load_case(_fmt))
+
+
+@case("SearchEngine._build", repeat=1)
+def _engine_build(fx):
+    from SearchEngine import SearchEngine
+    corpus = fx.corpus()
+    return lambda: SearchEngine(corpus)
+
+
+@case("SearchEngine.search", repeat=200)
+def _search(fx):
+    engine = fx.engine()
+    queries = itertools.cycle(QUERIES)
+    return lambda: engine.search(next(queries), top_n=10)
+
+
+@case("Corpus.concorde")
+def _concorde(fx):
+    corpus = fx.corpus()
+    corpus._build_all_text_once()
+    return lambda: corpus.concorde(r"\bamerica\b", context=30)
+
+
+@case("Corpus.stats")
+def _stats(fx):
+    corpus = fx.corpus()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return corpus.stats(n=20)
+    return run
+
+
+@case("Explorer.compare_by_type")
+def _compare(fx):
+    from explorer import Explorer
+    corpus = fx.corpus()
+    types = sorted({doc.getType() for doc in corpus.id2doc.values()})
+    if len(types) >= 2:
+        return lambda: Explorer(corpus).compare_by_type(types[0], types[1], top_n=20)
+    # single-type corpus (Discours: sentences only): same job between two authors
+    a, b = sorted(corpus.authors, key=lambda name: -corpus.authors[name].ndoc)[:2]
+    return lambda: Explorer(corpus).compare_by_author(a, b, top_n=20)
+
+
+@case("Explorer.temporal_trend")
+def _trend(fx):
+    from explorer import Explorer
+    corpus = fx.corpus()
+    return lambda: Explorer(corpus).temporal_trend("america", freq="M")
+
+
+# Runner
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_case(name: str, size, workdir: str, discours: Optional[str] = None) -> dict:
+    setup, repeat = CASES[name]
+    fx = Fixture(size, workdir, discours)
+    fn = setup(fx)
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    # one more run under tracemalloc for allocation stats (slower, not timed)
+    tracemalloc.start()
+    result = fn()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    blocks = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del result
+
+    t = np.array(times)
+    return {
+        "repeat": repeat,
+        "wall_p50": float(np.percentile(t, 50)),
+        "wall_p99": float(np.percentile(t, 99)),
+        "wall_mean": float(t.mean()),
+        "peak_rss_mb": _peak_rss_mb(),
+        "alloc_peak_mb": alloc_peak / (1024 * 1024),
+        "alloc_live_blocks": int(blocks),
+    }
+
+
+def _run_isolated(name, size, workdir, discours):
+    import multiprocessing as mp
+
+    method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+    with mp.get_context(method).Pool(1) as pool:
+        return pool.apply(run_case, (name, size, workdir, discours))
+
+
+def run_all(sizes, cases=None, discours=None, isolate=True, workdir=None,
+            log: Callable[[str], None] = print) -> dict:
+    cases = cases or list(CASES)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        labels = list(sizes) + (["discours"] if discours else [])
+        for size in labels:
+            for name in cases:
+                key = f"{size}/{name}"
+                try:
+                    if isolate:
+                        res = _run_isolated(name, size, tmp, discours)
+                    else:
+                        res = run_case(name, size, tmp, discours)
+                except Exception as e:  # keep going, record the failure
+                    res = {"error": f"{type(e).__name__}: {e}"}
+                results[key] = res
+                if "error" in res:
+                    log(f"{key:55s} ERROR {res['error']}")
+                else:
+                    log(f"{key:55s} p50={res['wall_p50'] * 1e3:10.2f} ms  "
+                        f"p99={res['wall_p99'] * 1e3:10.2f} ms  rss={res['peak_rss_mb'] or 0:8.1f} MB  "
+                        f"alloc={res['alloc_peak_mb']:8.1f} MB")
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "isolated": isolate,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25):
+    """DataFrame of p50 ratios current / baseline, flagged above 1 + tolerance."""
+    import pandas as pd
+
+    rows = []
+    for key, new in current["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if not old or "error" in old or "error" in new:
+            continue
+        ratio = new["wall_p50"] / old["wall_p50"] if old["wall_p50"] else float("inf")
+        rows.append({
+            "case": key,
+            "baseline_ms": old["wall_p50"] * 1e3,
+            "current_ms": new["wall_p50"] * 1e3,
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance,
+        })
+    return pd.DataFrame(rows, columns=["case", "baseline_ms", "current_ms", "ratio", "regression"])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Corpus / SearchEngine benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="synthetic corpus sizes (documents), up to 1000000")
+    parser.add_argument("--discours", default=None, help="also run on this discours_US.csv")
+    parser.add_argument("--cases", nargs="*", default=None, help=f"subset of: {', '.join(CASES)}")
+    parser.add_argument("--save", default=None, help="write results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="JSON baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--no-isolate", action="store_true", help="run every case in this process")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.cases or []) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    report = run_all(args.sizes, args.cases, args.discours, isolate=not args.no_isolate)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written: {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        table = compare(report, baseline, args.tolerance)
+        print(table.to_string(index=False))
+        if table["regression"].any():
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# cooccurrence.py
+"""
+TD9-10: word co-occurrence and collocations.
+
+    co = Cooccurrence(engine)
+    co.collocations("freedom", auteur="CLINTON", measure="llr")
+
+Two kinds of co-occurrence matrix (term x term, scipy.sparse, vocab ids of
+the SearchEngine):
+- mode="document": number of documents (sentences / documents) containing
+  both words, computed as B.T @ W @ B where B is the binarized mat_TF and W
+  the number of documents sharing each row (SearchEngine unique_texts)
+- mode="window": number of times the two words appear within `window`
+  tokens of each other, counted by a mapreduce Analysis (WindowPairs) on one
+  document per row, weighted by the number of documents of the row
+Both can be restricted to a subset of documents (auteur, type, predicate or
+explicit doc ids); the matrix of each (mode, window, subset) is cached.
+Collocations of a word rank its co-occurring words by PMI or by Dunning's
+log-likelihood ratio, computed from one matrix row.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix, diags
+
+import mapreduce
+from profiling import count, stage
+
+MEASURES = ("pmi", "llr")
+
+
+class WindowPairs(mapreduce.Analysis):
+    """
+    Pairs of vocabulary words at distance 1..window, in text order (a, b);
+    each pair of a document counts weights[doc_id] times (default 1).
+    """
+
+    with_ids = True
+
+    def __init__(self, vocab_ids: dict, window: int, weights: Optional[dict] = None):
+        self.vocab_ids = vocab_ids
+        self.window = window
+        self.weights = weights or {}
+
+    def map(self, corpus, docs):
+        V = len(self.vocab_ids)
+        left, right, counts = [], [], []
+        for doc_id, doc in docs:
+            ids = np.array([self.vocab_ids[w] for w in mapreduce.tokens(corpus, doc.texte)
+                            if w in self.vocab_ids], dtype=np.int64)
+            weight = self.weights.get(doc_id, 1)
+            for d in range(1, self.window + 1):
+                if d >= len(ids):
+                    break
+                left.append(ids[:-d])
+                right.append(ids[d:])
+                counts.append(np.full(len(ids) - d, weight, dtype=np.int64))
+        if not left:
+            return csr_matrix((V, V), dtype=np.int64)
+        i = np.concatenate(left)
+        j = np.concatenate(right)
+        return coo_matrix((np.concatenate(counts), (i, j)), shape=(V, V)).tocsr()
+
+    def reduce(self, acc, part):
+        return acc + part
+
+    def finalize(self, acc):
+        # symmetric counts: (a, b) and (b, a) are the same pair, but a pair of
+        # the same word (a, a) must not be counted twice
+        return (acc + acc.T - diags(acc.diagonal(), dtype=acc.dtype)).tocsr()
+
+
+class Cooccurrence:
+    """
+    Co-occurrence matrices and collocations over a SearchEngine's vocabulary.
+    - matrix(mode, window, rows) -> (C, marginals, n), cached per subset
+    - cooccurring(term, ...) -> raw co-occurrence counts of one word
+    - collocations(term, measure='pmi'|'llr', ...) -> ranked DataFrame
+    """
+
+    def __init__(self, engine, processes: Optional[int] = None, cache_size: int = 8):
+        self.engine = engine
+        self.processes = processes
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._words = sorted(engine.vocab, key=lambda w: engine.vocab[w]["id"])
+        self._binary = None
+        self._rows_cache = {}  # (auteur, type) -> (rows, weights)
+
+    # Subsets
+
+    def subset(self, auteur: Optional[str] = None, type: Optional[str] = None,
+               where: Optional[Callable] = None, doc_ids: Optional[Iterable[int]] = None):
+        """
+        (rows, weights) of the documents matching every given filter, or
+        (None, None) for the whole corpus. rows are engine rows; a shared row
+        (unique_texts) is kept if one of its documents matches, and weights[k]
+        is the number of its documents that match.
+        """
+        if auteur is None and type is None and where is None and doc_ids is None:
+            return None, None
+        simple = where is None and doc_ids is None
+        if simple and (auteur, type) in self._rows_cache:
+            return self._rows_cache[auteur, type]
+        wanted = set(doc_ids) if doc_ids is not None else None
+        id2doc = self.engine.corpus.id2doc
+
+        def keep(doc_id):
+            if wanted is not None and doc_id not in wanted:
+                return False
+            doc = id2doc[doc_id]
+            if auteur is not None and doc.auteur != auteur:
+                return False
+            if type is not None and doc.getType() != type:
+                return False
+            return where is None or bool(where(doc))
+
+        rows, weights = [], []
+        for i, members in enumerate(self.engine.row_members):
+            k = sum(1 for d in members if keep(d))
+            if k:
+                rows.append(i)
+                weights.append(k)
+        out = (np.array(rows, dtype=np.int64), np.array(weights, dtype=np.int64))
+        if simple:
+            self._rows_cache[auteur, type] = out
+        return out
+
+    def rows(self, auteur: Optional[str] = None, type: Optional[str] = None,
+             where: Optional[Callable] = None, doc_ids: Optional[Iterable[int]] = None) -> Optional[np.ndarray]:
+        """Engine rows of subset() (None = whole corpus)."""
+        return self.subset(auteur=auteur, type=type, where=where, doc_ids=doc_ids)[0]
+
+    # Matrices
+
+    def _binary_tf(self):
+        if self._binary is None:
+            B = self.engine.mat_TF.tocsr(copy=True)
+            B.data[:] = 1.0
+            self._binary = B
+        return self._binary
+
+    def _row_weights(self) -> np.ndarray:
+        """Number of documents behind each engine row (> 1 only with unique_texts)."""
+        return np.array([len(members) for members in self.engine.row_members], dtype=np.int64)
+
+    def matrix(self, mode: str = "document", window: int = 5, rows: Optional[np.ndarray] = None,
+               weights: Optional[np.ndarray] = None):
+        """
+        (C, marginals, n) for a subset of engine rows (None = all), each row
+        counting weights[k] documents (default: all the documents of the row,
+        see subset()):
+        document mode: marginals = df of each word, n = number of documents
+        window mode: marginals = row sums of C, n = total pair count
+        """
+        if mode not in ("document", "window"):
+            raise ValueError("mode must be 'document' or 'window'")
+        if rows is not None and weights is None:
+            weights = self._row_weights()[rows]
+        key = (mode, window if mode == "window" else None, None if rows is None else rows.tobytes(),
+               None if weights is None else weights.tobytes())
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            count("cooc.cache_hit")
+            return hit
+        count("cooc.cache_miss")
+
+        with stage(f"cooc.{mode}"):
+            if mode == "document":
+                B = self._binary_tf()
+                w = self._row_weights()
+                if rows is not None:
+                    B, w = B[rows], weights
+                C = (B.T @ diags(w.astype(float)) @ B).tocsr()
+                marginals = C.diagonal()
+                C.setdiag(0)
+                C.eliminate_zeros()
+                n = w.sum()
+            else:
+                if rows is None:
+                    rows, weights = np.arange(self.engine.N), self._row_weights()
+                ids = [self.engine.doc_ids[i] for i in rows]
+                vocab_ids = {w: info["id"] for w, info in self.engine.vocab.items()}
+                per_doc = {d: int(k) for d, k in zip(ids, weights) if k != 1}
+                C = mapreduce.run(self.engine.corpus, WindowPairs(vocab_ids, window, per_doc),
+                                  processes=self.processes, doc_ids=ids).astype(float)
+                marginals = np.asarray(C.sum(axis=1)).ravel()
+                n = C.sum()
+
+        entry = (C, np.asarray(marginals, dtype=float), float(n))
+        self._cache[key] = entry
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    # Queries
+
+    def _term_row(self, term, mode, window, subset):
+        term = term.lower().strip()
+        info = self.engine.vocab.get(term)
+        if info is None:
+            return None
+        rows, weights = self.subset(**subset)
+        C, marginals, n = self.matrix(mode=mode, window=window, rows=rows, weights=weights)
+        t = info["id"]
+        row = C.getrow(t)
+        return t, row.indices, row.data, marginals, n
+
+    def cooccurring(self, term: str, top_n: int = 20, mode: str = "document", window: int = 5,
+                    **subset) -> pd.DataFrame:
+        """Words most often found with `term` (raw counts)."""
+        cols = ["mot", "cooc", "freq"]
+        found = self._term_row(term, mode, window, subset)
+        if found is None:
+            return pd.DataFrame(columns=cols)
+        _, idx, c_tw, marginals, _ = found
+        order = np.argsort(-c_tw, kind="stable")[:top_n]
+        return pd.DataFrame({
+            "mot": [self._words[j] for j in idx[order]],
+            "cooc": c_tw[order].astype(int),
+            "freq": marginals[idx[order]].astype(int),
+        }, columns=cols)
+
+    def collocations(self, term: str, top_n: int = 20, measure: str = "pmi", mode: str = "document",
+                     window: int = 5, min_count: int = 2, **subset) -> pd.DataFrame:
+        """
+        Collocates of `term`, best first.
+        pmi: log2(P(t, w) / (P(t) P(w)))
+        llr: Dunning's G2 on the 2x2 contingency table (t / not t, w / not w)
+        Pairs seen fewer than min_count times are dropped (PMI favours rare words).
+        subset: auteur=, type=, where=, doc_ids= (see subset()).
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"measure must be one of {MEASURES}")
+        cols = ["mot", "cooc", "freq", measure]
+        found = self._term_row(term, mode, window, subset)
+        if found is None:
+            return pd.DataFrame(columns=cols)
+        t, idx, c_tw, marginals, n = found
+        keep = c_tw >= min_count
+        idx, c_tw = idx[keep], c_tw[keep]
+        if len(idx) == 0:
+            return pd.DataFrame(columns=cols)
+
+        c_t = marginals[t]
+        c_w = marginals[idx]
+        with stage("cooc.score"):
+            if measure == "pmi":
+                score = np.log2(c_tw * n / (c_t * c_w))
+            else:
+                score = _llr(c_tw, c_t, c_w, n)
+
+        order = np.argsort(-score, kind="stable")[:top_n]
+        return pd.DataFrame({
+            "mot": [self._words[j] for j in idx[order]],
+            "cooc": c_tw[order].astype(int),
+            "freq": c_w[order].astype(int),
+            measure: score[order],
+        }, columns=cols)
+
+
+def _llr(k11, c_t, c_w, n):
+    """Dunning's log-likelihood ratio (G2), vectorized over the collocates."""
+    k12 = c_t - k11
+    k21 = c_w - k11
+    k22 = n - c_t - c_w + k11
+    row1, row2 = k11 + k12, k21 + k22
+    col1, col2 = k11 + k21, k12 + k22
+
+    def term(k, r, c):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(k > 0, k * np.log(k * n / (r * c)), 0.0)
+
+    return 2.0 * (term(k11, row1, col1) + term(k12, row1, col2) + term(k21, row2, col1) + term(k22, row2, col2))
@@ -1,29 +1,36 @@
 # dataset_builders.py
 import pandas as pd
 from datetime import datetime
+from itertools import groupby
 from tqdm import tqdm
 
 from Corpus import Corpus
-from Document import Document
-from text_utils import split_sentences
+from Document import SpeechDocument, UNKNOWN_DATE
+from text_utils import sentence_offsets
 
 
 def build_corpus_from_discours_us(
     path: str,
     corpus_name: str = "Discours US",
     limit_rows: int | None = None,
+    processes: int | None = None,
+    dedup=None,
 ) -> Corpus:
     """
-    TD8: load discours_US.csv (tab-separated), split each speech into sentences,
-    each sentence becomes a Document.
+    TD8: load discours_US.csv (tab-separated), split each speech into sentences.
+    Each speech becomes a SpeechDocument (shared metadata + sentence spans) and
+    each sentence a SentenceDocument referencing it.
+    processes > 1 fans sentence segmentation out over a process pool.
+    dedup: optional dedup.Deduplicator (duplicate speeches are skipped).
     """
-    df = pd.read_csv(path, sep="\t", engine="python")
+    df = pd.read_csv(path, sep="\t")
     if limit_rows is not None:
         df = df.head(limit_rows)
 
-    corpus = Corpus(corpus_name)
+    corpus = Corpus(corpus_name, dedup=dedup)
 
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Building corpus (sentences)"):
+    speeches = []
+    for _, row in df.iterrows():
         speaker = str(row.get("speaker", "unknown") or "unknown")
         speech = str(row.get("text", "") or "")
         descr = str(row.get("descr", "") or "").strip()
@@ -31,7 +38,7 @@ def build_corpus_from_discours_us(
 
         # date
         raw_date = str(row.get("date", "") or "").strip()
-        dt = datetime.now()
+        dt = UNKNOWN_DATE
         for fmt in ("%B %d, %Y", "%b %d, %Y"):
             try:
                 dt = datetime.strptime(raw_date, fmt)
@@ -39,10 +46,14 @@ def build_corpus_from_discours_us(
             except ValueError:
                 pass
 
-        sentences = split_sentences(speech)
-        for i, sent in enumerate(sentences):
-            titre = descr if descr else f"Speech sentence #{i+1}"
-            doc = Document(titre=titre, auteur=speaker, date=dt, url=link, texte=sent)
-            corpus.add_document(doc)
+        speeches.append((speaker, speech, descr, link, dt))
+
+    # offsets only: (speech_id, sentence_index, start, end)
+    spans = sentence_offsets(((k, s[1]) for k, s in enumerate(speeches)), processes=processes)
+    for speech_id, group in tqdm(groupby(spans, key=lambda t: t[0]), desc="Building corpus (speeches)"):
+        speaker, speech, descr, link, dt = speeches[speech_id]
+        parent = SpeechDocument(titre=descr, auteur=speaker, date=dt, url=link, texte=speech,
+                                spans=[(start, end) for _, _, start, end in group])
+        corpus.add_speech(parent)
 
     return corpus
@@ -0,0 +1,231 @@
+# dedup.py
+"""
+Exact and near-duplicate detection for the Corpus.
+
+- exact duplicates: blake2b hash of the cleaned text (Corpus.nettoyer_texte)
+- near duplicates: MinHash signatures over word shingles, LSH banding to get
+  candidates, then signature agreement >= threshold
+
+Signatures are computed with NumPy for a whole batch of texts at once: one
+(num_perm x n_shingles) multiply-shift hash, then np.minimum.reduceat per
+document. Batches are capped so that matrix stays cache-friendly.
+"""
+from __future__ import annotations
+
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Corpus import Corpus
+
+_PRIME = np.uint64(4294967291)  # largest prime < 2**32
+_SHIFT = np.uint64(32)
+_MAX = np.uint64(np.iinfo(np.uint64).max)  # signature of a text without shingles
+
+
+class _Index:
+    """Exact hashes and MinHash LSH buckets of canonical items (documents or speeches)."""
+
+    def __init__(self):
+        self.exact: Dict[bytes, int] = {}  # text hash -> canonical id
+        self.sigs: Dict[int, np.ndarray] = {}  # canonical id -> signature
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+
+class Deduplicator:
+    """
+    Incremental duplicate detector used by Corpus.add_document / add_documents
+    / add_speech.
+    Only canonical (first seen) documents are indexed; every later duplicate is
+    attached to its canonical document in `self.canonical`.
+    drop=True -> duplicates are not added to the corpus (add_document returns
+    None).
+    Speeches are deduplicated as a whole, in a separate index
+    (`self.speech_canonical`): a duplicate speech is skipped with all its
+    sentences. Sentences of a kept speech are always stored, repeated ones
+    ("Thank you.") are only marked, since they were really said again.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 threshold: float = 0.8, near: bool = True, drop: bool = True,
+                 seed: int = 1, max_batch_shingles: int = 50_000):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.near = near
+        self.drop = drop
+        self.max_batch_shingles = max_batch_shingles
+
+        # multiply-shift hashing: h(x) = (a*x + b) >> 32, a odd, mod 2**64
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, _MAX, size=(num_perm, 1), dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, _MAX, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+
+        self._token_hash: Dict[str, int] = {}
+        self._docs = _Index()
+        self._speeches = _Index()
+
+        # doc_id -> (canonical doc_id, kind, similarity); same for speech ids
+        self.canonical: Dict[int, Tuple[int, str, float]] = {}
+        self.speech_canonical: Dict[int, Tuple[int, str, float]] = {}
+
+    def __setstate__(self, state):
+        # pickles written before the speech index existed
+        if "_docs" not in state:
+            docs = _Index()
+            docs.exact = state.pop("_exact", {})
+            docs.sigs = state.pop("_sigs", {})
+            docs.buckets = state.pop("_buckets", {})
+            state["_docs"] = docs
+            state["_speeches"] = _Index()
+            state["speech_canonical"] = {}
+        self.__dict__.update(state)
+
+    # Hashing
+
+    def _hash_tokens(self, tokens: List[str]) -> np.ndarray:
+        cache = self._token_hash
+        out = np.empty(len(tokens), dtype=np.uint64)
+        for i, w in enumerate(tokens):
+            h = cache.get(w)
+            if h is None:
+                h = cache[w] = zlib.crc32(w.encode("utf-8"))
+            out[i] = h
+        return out
+
+    def _shingles(self, tokens: List[str]) -> np.ndarray:
+        """Word k-gram hashes (whole text as one shingle when shorter than k)."""
+        h = self._hash_tokens(tokens) % _PRIME
+        k = self.shingle_size
+        if len(h) < k:
+            if len(h) == 0:
+                return h
+            k = len(h)
+        n = len(h) - k + 1
+        acc = h[:n].copy()
+        for j in range(1, k):
+            acc = (acc * np.uint64(31) + h[j:j + n]) % _PRIME
+        return acc
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """MinHash signatures, shape (len(texts), num_perm), vectorized by batch."""
+        sigs = np.full((len(texts), self.num_perm), _MAX, dtype=np.uint64)
+        shingles = [self._shingles(Corpus.nettoyer_texte(t).split()) for t in texts]
+
+        start = 0
+        while start < len(texts):
+            # batch docs so that the (num_perm x M) matrix stays bounded
+            end, m = start, 0
+            while end < len(texts) and (m == 0 or m + len(shingles[end]) <= self.max_batch_shingles):
+                m += len(shingles[end])
+                end += 1
+
+            idx = [i for i in range(start, end) if len(shingles[i])]
+            if idx:
+                flat = np.concatenate([shingles[i] for i in idx])
+                offsets = np.cumsum([0] + [len(shingles[i]) for i in idx[:-1]])
+                perm = self._a * flat[None, :]
+                perm += self._b
+                perm >>= _SHIFT
+                sigs[idx] = np.minimum.reduceat(perm, offsets, axis=1).T
+            start = end
+        return sigs
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        return hashlib.blake2b(Corpus.nettoyer_texte(text).encode("utf-8"), digest_size=16).digest()
+
+    # Lookup / insert
+
+    def _band_keys(self, sig: np.ndarray):
+        r = self.rows
+        return [(b, sig[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def _index(self, speech: bool) -> _Index:
+        return self._speeches if speech else self._docs
+
+    def _near_match(self, index: _Index, sig: np.ndarray) -> Tuple[Optional[int], float]:
+        candidates = set()
+        for key in self._band_keys(sig):
+            candidates.update(index.buckets.get(key, ()))
+        best, best_sim = None, 0.0
+        for c in candidates:
+            sim = float(np.mean(index.sigs[c] == sig))
+            if sim >= self.threshold and (sim > best_sim or (sim == best_sim and c < best)):
+                best, best_sim = c, sim
+        return best, best_sim
+
+    def find(self, text: str, signature: Optional[np.ndarray] = None,
+             speech: bool = False) -> Tuple[Optional[int], str, float]:
+        """
+        Return (canonical id, 'exact'|'near', similarity) or (None, '', 0.0);
+        speech=True looks up the speech index.
+        """
+        index = self._index(speech)
+        dup = index.exact.get(self.text_key(text))
+        if dup is not None:
+            return dup, "exact", 1.0
+        if self.near:
+            if signature is None:
+                signature = self.signatures([text])[0]
+            if (signature != _MAX).any():
+                dup, sim = self._near_match(index, signature)
+                if dup is not None:
+                    return dup, "near", sim
+        return None, "", 0.0
+
+    def add(self, doc_id: int, text: str, signature: Optional[np.ndarray] = None,
+            speech: bool = False) -> None:
+        """Index `doc_id` (a speech id if speech=True) as a canonical item."""
+        index = self._index(speech)
+        index.exact[self.text_key(text)] = doc_id
+        if self.near:
+            if signature is None:
+                signature = self.signatures([text])[0]
+            if (signature != _MAX).any():
+                index.sigs[doc_id] = signature
+                for key in self._band_keys(signature):
+                    index.buckets.setdefault(key, []).append(doc_id)
+
+    def mark(self, doc_id: int, canonical_id: int, kind: str, similarity: float,
+             speech: bool = False) -> None:
+        (self.speech_canonical if speech else self.canonical)[doc_id] = (canonical_id, kind, similarity)
+
+    # Report
+
+    def clusters(self) -> Dict[int, List[int]]:
+        """canonical doc_id -> list of duplicate doc_ids."""
+        out: Dict[int, List[int]] = {}
+        for doc_id, (canon, _, _) in self.canonical.items():
+            out.setdefault(canon, []).append(doc_id)
+        return out
+
+    def report(self, corpus: Optional[Corpus] = None) -> pd.DataFrame:
+        """
+        One row per duplicate: canonical_id, doc_id, kind, similarity
+        (+ the canonical text when a corpus is given). Sorted by cluster size.
+        """
+        cols = ["canonical_id", "doc_id", "kind", "similarity", "cluster_size"]
+        rows = []
+        for canon, members in self.clusters().items():
+            for doc_id in members:
+                _, kind, sim = self.canonical[doc_id]
+                rows.append({
+                    "canonical_id": canon,
+                    "doc_id": doc_id,
+                    "kind": kind,
+                    "similarity": sim,
+                    "cluster_size": len(members) + 1,
+                })
+        df = pd.DataFrame(rows, columns=cols)
+        if corpus is not None:
+            df["texte"] = [corpus.id2doc[c].texte if c in corpus.id2doc else "" for c in df["canonical_id"]]
+        return df.sort_values(["cluster_size", "canonical_id", "doc_id"],
+                              ascending=[False, True, True]).reset_index(drop=True)
@@ -1,43 +1,50 @@
 # explorer.py
 import math
 import pandas as pd
-from collections import Counter
-from datetime import datetime
+
+import mapreduce
+from profiling import timed
 
 class Explorer:
     """
     TD9-10: higher-level exploration utilities:
-    - compare two subcorpora (by type/source)
+    - compare two subcorpora (by type/source or by author)
     - temporal evolution of a word/group
+    Analyses run as mapreduce.run jobs; processes > 1 uses a process pool.
     """
 
-    def __init__(self, corpus):
+    def __init__(self, corpus, processes=None, engine=None):
         self.corpus = corpus
+        self.processes = processes
+        self.engine = engine  # SearchEngine for co-occurrence, built on first use
+        self._cooc = None
 
     def _tokens(self, text: str):
-        cleaned = self.corpus.nettoyer_texte(text)
-        return cleaned.split() if cleaned else []
+        return mapreduce.tokens(self.corpus, text)
+
+    def run(self, analysis: mapreduce.Analysis, doc_ids=None):
+        """Run any mapreduce.Analysis over the corpus (or a subset of doc ids)."""
+        return mapreduce.run(self.corpus, analysis, processes=self.processes, doc_ids=doc_ids)
 
+    @timed("explorer.compare_by_type")
     def compare_by_type(self, type_a: str, type_b: str, top_n: int = 20) -> pd.DataFrame:
         """
         Compare vocab between two doc types (Reddit vs Arxiv).
         Returns a dataframe with TF and relative TF.
         """
-        a_counts = Counter()
-        b_counts = Counter()
-        a_total = 0
-        b_total = 0
-
-        for doc in self.corpus.id2doc.values():
-            toks = self._tokens(doc.texte)
-            if not toks:
-                continue
-            if doc.getType() == type_a:
-                a_counts.update(toks)
-                a_total += len(toks)
-            elif doc.getType() == type_b:
-                b_counts.update(toks)
-                b_total += len(toks)
+        return self._compare("type", type_a, type_b, top_n)
+
+    @timed("explorer.compare_by_author")
+    def compare_by_author(self, auteur_a: str, auteur_b: str, top_n: int = 20) -> pd.DataFrame:
+        """Same comparison between two authors (e.g. CLINTON vs TRUMP)."""
+        return self._compare("auteur", auteur_a, auteur_b, top_n)
+
+    def _compare(self, field: str, a: str, b: str, top_n: int) -> pd.DataFrame:
+        if a == b:
+            raise ValueError(f"compare two different values of {field!r}, got {a!r} twice")
+        per_value = self.run(mapreduce.FieldCounts(field, [a, b]))
+        a_counts, a_total = per_value[a]
+        b_counts, b_total = per_value[b]
 
         rows = []
         vocab = set(a_counts) | set(b_counts)
@@ -48,10 +55,10 @@ class Explorer:
             b_rel = b_tf / b_total if b_total else 0.0
             rows.append({
                 "mot": w,
-                f"tf_{type_a}": a_tf,
-                f"tf_{type_b}": b_tf,
-                f"rel_{type_a}": a_rel,
-                f"rel_{type_b}": b_rel,
+                f"tf_{a}": a_tf,
+                f"tf_{b}": b_tf,
+                f"rel_{a}": a_rel,
+                f"rel_{b}": b_rel,
                 "diff_rel": a_rel - b_rel
             })
 
@@ -59,22 +66,20 @@ class Explorer:
         df = df.sort_values("diff_rel", ascending=False).head(top_n).reset_index(drop=True)
         return df
 
+    @timed("explorer.temporal_trend")
     def temporal_trend(self, term: str, freq: str = "M") -> pd.DataFrame:
         """
         Track relative frequency of 'term' through time.
         freq: 'M' monthly, 'Y' yearly, etc.
         """
         term = term.lower().strip()
-        rows = []
+        ts = getattr(self.corpus, "timeseries", None)
+        if ts is not None:
+            # maintained index (timeseries.TermTimeSeries.attach)
+            return ts.series(term, freq=freq)
 
-        for doc in self.corpus.id2doc.values():
-            dt = doc.date if isinstance(doc.date, datetime) else datetime.now()
-            toks = self._tokens(doc.texte)
-            if not toks:
-                continue
-            total = len(toks)
-            hits = sum(1 for t in toks if t == term)
-            rows.append({"date": dt, "hits": hits, "total": total})
+        per_date = self.run(mapreduce.TermHits(term))
+        rows = [{"date": dt, "hits": hits, "total": total} for dt, (hits, total) in per_date.items()]
 
         if not rows:
             return pd.DataFrame(columns=["period", "hits", "total", "rel_freq"])
@@ -84,3 +89,32 @@ class Explorer:
         agg = df.groupby("period", as_index=False)[["hits", "total"]].sum()
         agg["rel_freq"] = agg["hits"] / agg["total"].replace(0, 1)
         return agg
+
+    @timed("explorer.trending")
+    def trending(self, freq: str = "W", window: int = 4, top_n: int = 20, at=None) -> pd.DataFrame:
+        """Bursting terms (see timeseries.TermTimeSeries.trending); attaches the index on first use."""
+        ts = getattr(self.corpus, "timeseries", None)
+        if ts is None:
+            from timeseries import TermTimeSeries
+            ts = TermTimeSeries.attach(self.corpus, processes=self.processes)
+        return ts.trending(freq=freq, window=window, at=at, top_n=top_n)
+
+    @property
+    def cooccurrence(self):
+        if self._cooc is None:
+            from cooccurrence import Cooccurrence
+            if self.engine is None:
+                from SearchEngine import SearchEngine
+                self.engine = SearchEngine(self.corpus)
+            self._cooc = Cooccurrence(self.engine, processes=self.processes)
+        return self._cooc
+
+    @timed("explorer.collocations")
+    def collocations(self, term: str, top_n: int = 20, measure: str = "pmi", mode: str = "document",
+                     window: int = 5, **subset) -> pd.DataFrame:
+        """
+        Words that co-occur with 'term' (PMI or log-likelihood), optionally
+        within a subset: auteur=, type=, where=, doc_ids=.
+        """
+        return self.cooccurrence.collocations(term, top_n=top_n, measure=measure, mode=mode,
+                                              window=window, **subset)
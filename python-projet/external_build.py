@@ -0,0 +1,317 @@
+# external_build.py
+"""
+Out-of-core index build for corpora larger than RAM.
+
+    path = build_index_external(iter_tsv_documents("big_corpus.tsv"), "indexes/", memory_limit_mb=256)
+    IndexSnapshot.current("indexes/").search("america freedom")
+
+Same index as query_server.publish_index(SearchEngine(corpus), root)
+(L2-normalized TF-IDF, CSC arrays, sorted vocabulary, meta.bin), built
+without ever holding the corpus or the matrix in memory:
+
+1. documents are streamed once; (term, row, tf) postings are buffered in
+   compact arrays and flushed as a sorted run (term, then row) to a
+   temporary directory whenever the buffer reaches its share of the budget
+2. the runs are k-way merged, one block of terms at a time (block size
+   bounded by the budget), straight into memory-mapped data / indices
+   arrays in final vocabulary order, with idf applied
+3. rows are normalized in place, chunk by chunk
+
+What stays in memory is the vocabulary (term -> id, df) and the per-run
+term directories; row-sized arrays (norms, doc ids, metadata offsets) live
+in memory-mapped or spooled files.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from Corpus import Corpus
+from profiling import count, stage
+from query_server import doc_metadata, finish_version, start_version
+
+# bytes per buffered posting at flush time: 3 int32 columns + their sorted
+# copies + the int64 sort permutation (+ np.unique temporaries)
+_BYTES_PER_POSTING = 3 * 4 * 2 + 8 + 16
+
+
+def _release(*arrays) -> None:
+    """
+    Drop the resident pages of memory-mapped arrays: file-backed pages count
+    in RSS until released (the data stays in the file / page cache).
+    """
+    for a in arrays:
+        m = getattr(a, "_mmap", None)
+        if m is not None and hasattr(m, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+            m.madvise(mmap.MADV_DONTNEED)
+
+
+def iter_corpus_documents(corpus: Corpus) -> Iterator[Tuple[int, object]]:
+    """(doc_id, document) in SearchEngine row order (sorted doc ids)."""
+    for doc_id in sorted(corpus.id2doc):
+        yield doc_id, corpus.id2doc[doc_id]
+
+
+def iter_tsv_documents(path: str, chunksize: int = 10_000) -> Iterator[Tuple[int, object]]:
+    """
+    Stream a TSV written by Corpus.save (csv format) by chunks of rows;
+    doc ids are numbered in row order, as Corpus.load does.
+    """
+    import pandas as pd
+
+    doc_id = 0
+    for chunk in pd.read_csv(path, sep="\t", chunksize=chunksize):
+        for _, row in chunk.iterrows():
+            yield doc_id, Corpus.document_from_row(row)
+            doc_id += 1
+
+
+class _Spool:
+    """Append-only int64 column kept on disk, converted to .npy at the end."""
+
+    def __init__(self, path: str, buffer: int = 1 << 16):
+        self.path = path
+        self.f = open(path, "wb")
+        self.buf = array("q")
+        self.buffer = buffer
+        self.n = 0
+
+    def append(self, value: int) -> None:
+        self.buf.append(value)
+        self.n += 1
+        if len(self.buf) >= self.buffer:
+            self.flush()
+
+    def flush(self) -> None:
+        self.buf.tofile(self.f)
+        self.buf = array("q")
+
+    def to_npy(self, dest: str, chunk: int = 1 << 20) -> None:
+        self.flush()
+        self.f.close()
+        src = np.memmap(self.path, dtype=np.int64, mode="r") if self.n else np.zeros(0, dtype=np.int64)
+        out = np.lib.format.open_memmap(dest, mode="w+", dtype=np.int64, shape=(self.n,))
+        for s in range(0, self.n, chunk):
+            out[s:s + chunk] = src[s:s + chunk]
+        out.flush()
+        del out, src
+        os.remove(self.path)
+
+
+class _Run:
+    """One sorted run on disk: postings sorted by (term, row) + its term directory."""
+
+    def __init__(self, directory: str, k: int):
+        self.prefix = os.path.join(directory, f"run{k:05d}")
+
+    def write(self, terms: np.ndarray, rows: np.ndarray, tfs: np.ndarray) -> None:
+        order = np.argsort(terms, kind="stable")  # rows were appended in order
+        terms, rows, tfs = terms[order], rows[order], tfs[order]
+        uterms, starts, lengths = np.unique(terms, return_index=True, return_counts=True)
+        np.save(self.prefix + ".rows.npy", rows)
+        np.save(self.prefix + ".tfs.npy", tfs)
+        np.save(self.prefix + ".terms.npy", uterms.astype(np.int32))
+        np.save(self.prefix + ".starts.npy", starts.astype(np.int64))
+        np.save(self.prefix + ".lengths.npy", lengths.astype(np.int64))
+
+    def release(self) -> None:
+        _release(self.rows, self.tfs, self.terms, self.starts, self.lengths)
+
+    def open(self):
+        load = lambda name: np.load(self.prefix + name, mmap_mode="r")
+        self.rows = load(".rows.npy")
+        self.tfs = load(".tfs.npy")
+        self.terms = load(".terms.npy")
+        self.starts = load(".starts.npy")
+        self.lengths = load(".lengths.npy")
+        return self
+
+    def gather(self, block_terms: np.ndarray):
+        """(position in block, rows, tfs) of the postings of block_terms (provisional ids)."""
+        empty = np.zeros(0, dtype=np.int64)
+        if len(self.terms) == 0:
+            return empty, empty, empty
+        pos = np.minimum(np.searchsorted(self.terms, block_terms), len(self.terms) - 1)
+        hit = np.flatnonzero(self.terms[pos] == block_terms)
+        starts = self.starts[pos[hit]]
+        lengths = self.lengths[pos[hit]]
+        total = int(lengths.sum())
+        if total == 0:
+            return empty, empty, empty
+        # concatenated ranges [start, start + length) without a Python loop
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        idx = offsets + np.arange(total)
+        return np.repeat(hit, lengths), np.asarray(self.rows[idx]), np.asarray(self.tfs[idx])
+
+
+class ExternalIndexBuilder:
+    """
+    Streaming builder; see build_index_external. memory_limit_mb bounds the
+    posting buffer, the merge blocks and the normalization chunks.
+    """
+
+    def __init__(self, root: str, memory_limit_mb: float = 256, tmp_dir: Optional[str] = None):
+        self.root = root
+        self.budget = int(memory_limit_mb * 1024 * 1024)
+        self.max_postings = max(1024, self.budget // _BYTES_PER_POSTING)
+        self.tmp_dir = tmp_dir
+
+        self.term_ids: Dict[str, int] = {}
+        self.df = array("q")
+        self.N = 0
+        self.runs: List[_Run] = []
+
+        self._terms = array("i")
+        self._rows = array("i")
+        self._tfs = array("i")
+
+    # 1) stream + sorted runs
+
+    def _flush_run(self) -> None:
+        if not self._terms:
+            return
+        with stage("external.flush_run"):
+            run = _Run(self.work, len(self.runs))
+            run.write(np.frombuffer(self._terms, dtype=np.int32),
+                      np.frombuffer(self._rows, dtype=np.int32),
+                      np.frombuffer(self._tfs, dtype=np.int32))
+            self.runs.append(run)
+        count("external.runs")
+        count("external.postings", len(self._terms))
+        self._terms, self._rows, self._tfs = array("i"), array("i"), array("i")
+
+    def _add(self, doc_id: int, doc) -> None:
+        row = self.N
+        self.N += 1
+        self.doc_ids.append(doc_id)
+        blob = doc_metadata(doc)
+        self.meta.write(blob)
+        self.meta_end += len(blob)
+        self.meta_offsets.append(self.meta_end)
+
+        cleaned = Corpus.nettoyer_texte(doc.texte)
+        local: Dict[str, int] = {}
+        for w in cleaned.split() if cleaned else []:
+            local[w] = local.get(w, 0) + 1
+        for w, c in local.items():
+            t = self.term_ids.get(w)
+            if t is None:
+                t = self.term_ids[w] = len(self.df)
+                self.df.append(0)
+            self.df[t] += 1
+            self._terms.append(t)
+            self._rows.append(row)
+            self._tfs.append(c)
+        if len(self._terms) >= self.max_postings:
+            self._flush_run()
+
+    # 2) k-way merge into the final CSC arrays
+
+    def _merge(self, version_dir: str, order: np.ndarray, idf: np.ndarray):
+        df = np.frombuffer(self.df, dtype=np.int64)[order] if len(self.df) else np.zeros(0, dtype=np.int64)
+        nnz = int(df.sum())
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        np.save(os.path.join(version_dir, "indptr.npy"), indptr)
+        data = np.lib.format.open_memmap(os.path.join(version_dir, "data.npy"), mode="w+",
+                                         dtype=np.float32, shape=(nnz,))
+        indices = np.lib.format.open_memmap(os.path.join(version_dir, "indices.npy"), mode="w+",
+                                            dtype=np.int32, shape=(nnz,))
+        norms = np.lib.format.open_memmap(os.path.join(self.work, "norms.npy"), mode="w+",
+                                          dtype=np.float64, shape=(self.N,))
+        runs = [run.open() for run in self.runs]
+
+        block_postings = max(1, self.budget // 64)
+        t0 = 0
+        V = len(order)
+        with stage("external.merge"):
+            while t0 < V:
+                # largest block of terms whose postings fit the budget (at least one term)
+                t1 = int(np.searchsorted(indptr, indptr[t0] + block_postings, side="right")) - 1
+                t1 = min(V, max(t1, t0 + 1))
+                block = order[t0:t1].astype(np.int32)
+                keys, rows, tfs = [], [], []
+                for run in runs:  # runs are in row order: stable sort keeps rows sorted per term
+                    k, r, f = run.gather(block)
+                    keys.append(k)
+                    rows.append(r)
+                    tfs.append(f)
+                keys = np.concatenate(keys)
+                perm = np.argsort(keys, kind="stable")
+                rows = np.concatenate(rows)[perm]
+                weights = np.concatenate(tfs)[perm] * idf[t0:t1][keys[perm]]
+
+                s, e = indptr[t0], indptr[t1]
+                indices[s:e] = rows
+                data[s:e] = weights
+                np.add.at(norms, rows, weights * weights)
+                for run in runs:
+                    run.release()
+                _release(data, indices, norms)
+                count("external.merge_blocks")
+                t0 = t1
+
+        # 3) unit rows, chunk by chunk
+        with stage("external.normalize"):
+            chunk = max(1, self.budget // 32)
+            for s in range(0, self.N, chunk):
+                root = np.sqrt(norms[s:s + chunk])
+                root[root == 0] = 1.0
+                norms[s:s + chunk] = root
+            for s in range(0, nnz, chunk):
+                data[s:s + chunk] = data[s:s + chunk] / norms[indices[s:s + chunk]]
+                _release(data, indices, norms)
+        data.flush()
+        indices.flush()
+        del data, indices, norms, runs
+        return nnz
+
+    def build(self, documents: Iterable[Tuple[int, object]]) -> str:
+        version, version_dir = start_version(self.root)
+        self.work = tempfile.mkdtemp(prefix="index-runs-", dir=self.tmp_dir)
+        try:
+            self.doc_ids = _Spool(os.path.join(self.work, "doc_ids.bin"))
+            self.meta_offsets = _Spool(os.path.join(self.work, "meta_offsets.bin"))
+            self.meta_offsets.append(0)
+            self.meta_end = 0
+            with stage("external.stream"), open(os.path.join(version_dir, "meta.bin"), "wb") as self.meta:
+                for doc_id, doc in documents:
+                    self._add(doc_id, doc)
+                self._flush_run()
+            self._terms = self._rows = self._tfs = None
+            count("external.docs", self.N)
+
+            words = np.array(list(self.term_ids), dtype=str)
+            order = np.argsort(words, kind="stable")  # final id -> provisional id
+            words = words[order]
+            self.term_ids = {}
+            df = np.frombuffer(self.df, dtype=np.int64)[order] if len(self.df) else np.zeros(0, dtype=np.int64)
+            idf = np.log((self.N + 1) / (df + 1.0)) + 1.0
+
+            nnz = self._merge(version_dir, order, idf)
+
+            np.save(os.path.join(version_dir, "vocab.npy"), words if len(words) else np.array([""], dtype=str))
+            np.save(os.path.join(version_dir, "idf.npy"), idf.astype(np.float32))
+            self.doc_ids.to_npy(os.path.join(version_dir, "doc_ids.npy"))
+            self.meta_offsets.to_npy(os.path.join(version_dir, "meta_offsets.npy"))
+            return finish_version(self.root, version, version_dir, {"N": self.N, "V": len(words), "nnz": nnz})
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        finally:
+            shutil.rmtree(self.work, ignore_errors=True)
+
+
+def build_index_external(documents: Iterable[Tuple[int, object]], root: str, memory_limit_mb: float = 256,
+                         tmp_dir: Optional[str] = None) -> str:
+    """
+    Build and publish (query_server format) the index of a stream of
+    (doc_id, document) pairs, e.g. iter_tsv_documents(path) or
+    iter_corpus_documents(corpus). Returns the version directory.
+    """
+    return ExternalIndexBuilder(root, memory_limit_mb=memory_limit_mb, tmp_dir=tmp_dir).build(documents)
@@ -0,0 +1,237 @@
+# ingestion.py
+"""
+Async ingestion pipeline (Reddit / Arxiv -> Corpus).
+
+Sources produce plain records (the keyword arguments of DocumentFactory.create).
+They are consumed concurrently, turned into Documents and added to a Corpus in
+batches. Any object implementing `Source` can be plugged in, so the pipeline can
+run against a local stub HTTP server (ArxivSource(base_url=...)) or recorded
+fixtures (RecordedSource) without network access.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterable, List
+
+from Corpus import Corpus
+from Document import Document, DocumentFactory, UNKNOWN_DATE
+
+Record = Dict[str, Any]
+
+ARXIV_URL = "http://export.arxiv.org/api/query?"
+
+
+class Source(ABC):
+    """Interface of an ingestion source: an async stream of records."""
+
+    name = "source"
+
+    @abstractmethod
+    def records(self) -> AsyncIterator[Record]:
+        """Yield records accepted by DocumentFactory.create(**record)."""
+
+
+class RecordedSource(Source):
+    """Replays records from a list or a JSON file (tests, offline runs)."""
+
+    name = "recorded"
+
+    def __init__(self, records: Iterable[Record]):
+        self._records = list(records)
+
+    @classmethod
+    def from_json(cls, path: str) -> "RecordedSource":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    async def records(self) -> AsyncIterator[Record]:
+        for rec in self._records:
+            yield dict(rec)
+
+
+def parse_arxiv_feed(data: bytes) -> List[Record]:
+    """Parse one Arxiv Atom page into records (same mapping as td3.py)."""
+    import xmltodict
+
+    parsed = xmltodict.parse(data)
+    entries = parsed.get("feed", {}).get("entry", [])
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    records = []
+    for entry in entries:
+        summary = (entry.get("summary") or "").replace("\n", " ").strip()
+        if not summary:
+            continue
+
+        titre = (entry.get("title") or "").replace("\n", " ").strip()
+
+        author_field = entry.get("author", {})
+        if isinstance(author_field, list) and author_field:
+            auteur = author_field[0].get("name", "unknown")
+            co_auteurs = [a.get("name", "") for a in author_field[1:] if a.get("name")]
+        elif isinstance(author_field, dict):
+            auteur = author_field.get("name", "unknown")
+            co_auteurs = []
+        else:
+            auteur = "unknown"
+            co_auteurs = []
+
+        published = entry.get("published") or entry.get("updated") or ""
+        records.append({
+            "source": "arxiv",
+            "titre": titre or "arxiv",
+            "auteur": auteur,
+            "date": str(published),
+            "url": entry.get("id") or "",
+            "texte": summary,
+            "co_auteurs": co_auteurs,
+        })
+    return records
+
+
+class ArxivSource(Source):
+    """
+    Pages through the Arxiv API concurrently.
+    - at most `concurrency` HTTP requests in flight (asyncio.Semaphore)
+    - blocking urlopen and Atom parsing run in the default thread pool
+    - pages are yielded as soon as they complete (not in page order)
+    """
+
+    name = "arxiv"
+
+    def __init__(self, keyword: str, max_results: int = 100, page_size: int = 25,
+                 concurrency: int = 4, base_url: str = ARXIV_URL, timeout: float = 30.0):
+        if page_size <= 0 or concurrency <= 0:
+            raise ValueError("page_size and concurrency must be > 0")
+        self.keyword = keyword
+        self.max_results = int(max_results)
+        self.page_size = int(page_size)
+        self.concurrency = int(concurrency)
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def page_url(self, start: int) -> str:
+        n = min(self.page_size, self.max_results - start)
+        query = f"search_query=all:{urllib.parse.quote(self.keyword)}&start={start}&max_results={n}"
+        return self.base_url + query
+
+    def _download(self, url: str) -> bytes:
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return response.read()
+
+    async def _fetch_page(self, sem: asyncio.Semaphore, start: int) -> List[Record]:
+        async with sem:
+            data = await asyncio.to_thread(self._download, self.page_url(start))
+        return await asyncio.to_thread(parse_arxiv_feed, data)
+
+    async def records(self) -> AsyncIterator[Record]:
+        sem = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._fetch_page(sem, start))
+                 for start in range(0, self.max_results, self.page_size)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                for rec in await fut:
+                    yield rec
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+class RedditSource(Source):
+    """
+    Wraps a praw.Reddit client (blocking) behind the Source interface.
+    The client is injected so credentials stay out of this module.
+    """
+
+    name = "reddit"
+
+    def __init__(self, reddit, keyword: str, limit: int = 100, subreddit: str = "all"):
+        self.reddit = reddit
+        self.keyword = keyword
+        self.limit = int(limit)
+        self.subreddit = subreddit
+
+    def _fetch_all(self) -> List[Record]:
+        records = []
+        for submission in self.reddit.subreddit(self.subreddit).search(self.keyword, limit=self.limit):
+            if not submission.selftext:
+                continue
+            created = getattr(submission, "created_utc", None)
+            records.append({
+                "source": "reddit",
+                "titre": (submission.title or "").strip() or "reddit",
+                "auteur": str(submission.author) if submission.author else "unknown",
+                "date": created if created is not None else UNKNOWN_DATE,
+                "url": getattr(submission, "url", ""),
+                "texte": submission.selftext.replace("\n", " ").strip(),
+                "nb_commentaires": int(getattr(submission, "num_comments", 0) or 0),
+            })
+        return records
+
+    async def records(self) -> AsyncIterator[Record]:
+        for rec in await asyncio.to_thread(self._fetch_all):
+            yield rec
+
+
+# Pipeline
+
+_DONE = object()
+
+
+async def _produce(source: Source, queue: asyncio.Queue) -> None:
+    try:
+        async for rec in source.records():
+            await queue.put(rec)
+    finally:
+        await queue.put(_DONE)
+
+
+async def ingest_async(corpus: Corpus, sources: Iterable[Source], batch_size: int = 100,
+                       queue_size: int = 1000) -> int:
+    """
+    Run all sources concurrently and stream their records into `corpus`.
+    Documents are created with DocumentFactory.create and added by batches
+    of `batch_size`. Returns the number of documents stored (duplicates
+    dropped by the corpus dedup are not counted).
+    """
+    sources = list(sources)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    producers = [asyncio.create_task(_produce(s, queue)) for s in sources]
+
+    added = 0
+    batch: List[Document] = []
+    remaining = len(sources)
+    try:
+        while remaining:
+            rec = await queue.get()
+            if rec is _DONE:
+                remaining -= 1
+                continue
+            batch.append(DocumentFactory.create(**rec))
+            if len(batch) >= batch_size:
+                added += _stored(corpus.add_documents(batch))
+                batch = []
+        if batch:
+            added += _stored(corpus.add_documents(batch))
+        # re-raise source errors, if any
+        await asyncio.gather(*producers)
+    finally:
+        for p in producers:
+            p.cancel()
+    return added
+
+
+def _stored(ids: list) -> int:
+    """Number of ids actually stored (add_documents returns None for a dropped duplicate)."""
+    return sum(i is not None for i in ids)
+
+
+def ingest(corpus: Corpus, sources: Iterable[Source], batch_size: int = 100,
+           queue_size: int = 1000) -> int:
+    """Synchronous wrapper around ingest_async (scripts, main.py)."""
+    return asyncio.run(ingest_async(corpus, sources, batch_size=batch_size, queue_size=queue_size))
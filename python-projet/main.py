@@ -1,13 +1,20 @@
 # main.py
 # v2 (TD3 -> TD7)
-
+#
+#   python main.py                              # TD3 -> TD7 demo
+#   python main.py --query "climate change"     # one query, served from the cache
+#
+# The parsed corpus and a published index snapshot are cached in <tsv>.cache/
+# and reused while they are newer than the TSV (--rebuild forces a rebuild).
+# Heavy modules (pandas, SearchEngine) are imported only when needed.
+
+import argparse
 import os
+import sys
 from datetime import datetime
-import pandas as pd
 
 from Corpus import Corpus
-from Document import Document, RedditDocument, ArxivDocument
-from SearchEngine import SearchEngine
+from Document import Document, RedditDocument, ArxivDocument, UNKNOWN_DATE
 
 
 # Helpers: load data for v2
@@ -17,6 +24,8 @@ def load_corpus_from_tsv(tsv_path: str, corpus_name: str = "Corpus v2") -> Corpu
     if not os.path.exists(tsv_path):
         raise FileNotFoundError(f"TSV introuvable: {tsv_path}")
 
+    import pandas as pd
+
     df = pd.read_csv(tsv_path, sep="\t")
 
     corpus = Corpus(corpus_name)
@@ -34,7 +43,7 @@ def load_corpus_from_tsv(tsv_path: str, corpus_name: str = "Corpus v2") -> Corpu
             try:
                 dt = datetime.fromisoformat(date_str.replace("Z", ""))
             except ValueError:
-                dt = datetime.now()
+                dt = UNKNOWN_DATE
 
             if doc_type == "Reddit":
                 nb = int(row.get("nb_commentaires", 0))
@@ -68,7 +77,7 @@ def load_corpus_from_tsv(tsv_path: str, corpus_name: str = "Corpus v2") -> Corpu
         titre = f"{origine.upper()} doc {i+1}"
         auteur = "unknown"
         url = ""
-        dt = datetime.now()
+        dt = UNKNOWN_DATE
 
         if origine == "reddit":
             doc = RedditDocument(titre, auteur, dt, url, texte, nb_commentaires=0)
@@ -82,6 +91,64 @@ def load_corpus_from_tsv(tsv_path: str, corpus_name: str = "Corpus v2") -> Corpu
     return corpus
 
 
+# Startup fast path: cached corpus + index snapshot
+
+def cache_dir(tsv_path: str) -> str:
+    return tsv_path + ".cache"
+
+
+def _is_fresh(path: str, source: str) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source)
+
+
+def load_corpus_cached(tsv_path: str, corpus_name: str = "Corpus v2", rebuild: bool = False) -> Corpus:
+    """Pickled corpus from <tsv>.cache/ if newer than the TSV, else parse the TSV and cache it."""
+    if not os.path.exists(tsv_path):
+        raise FileNotFoundError(f"TSV introuvable: {tsv_path}")
+    path = os.path.join(cache_dir(tsv_path), "corpus.pkl")
+    if not rebuild and _is_fresh(path, tsv_path):
+        return Corpus.load(corpus_name, path, format_type="pickle")
+
+    corpus = load_corpus_from_tsv(tsv_path, corpus_name=corpus_name)
+    os.makedirs(cache_dir(tsv_path), exist_ok=True)
+    tmp = path + ".tmp"
+    corpus.save(tmp, format_type="pickle")
+    os.replace(tmp, path)
+    return corpus
+
+
+def load_index_cached(tsv_path: str, corpus_name: str = "Corpus v2", rebuild: bool = False):
+    """
+    query_server.IndexSnapshot (memory-mapped, no pandas / SearchEngine import)
+    from <tsv>.cache/index if newer than the TSV, else build and publish it.
+    """
+    from query_server import CURRENT, IndexSnapshot, publish_index, prune_versions
+
+    if not os.path.exists(tsv_path):
+        raise FileNotFoundError(f"TSV introuvable: {tsv_path}")
+    root = os.path.join(cache_dir(tsv_path), "index")
+    if not rebuild and _is_fresh(os.path.join(root, CURRENT), tsv_path):
+        return IndexSnapshot.current(root)
+
+    from SearchEngine import SearchEngine
+
+    corpus = load_corpus_cached(tsv_path, corpus_name=corpus_name, rebuild=rebuild)
+    publish_index(SearchEngine(corpus), root)
+    prune_versions(root, keep=1)
+    return IndexSnapshot.current(root)
+
+
+def run_query(tsv_path: str, query: str, top_n: int = 5, rebuild: bool = False):
+    """TD7 search through the cached index snapshot (TF-IDF cosine, like SearchEngine.search)."""
+    snapshot = load_index_cached(tsv_path, rebuild=rebuild)
+    results = snapshot.search(query, top_n=top_n)
+    if not results:
+        print("Aucun résultat.")
+    for rank, hit in enumerate(results, 1):
+        print(f"{rank:2d}. [{hit['score']:.4f}] {hit['titre']} ({hit['type']}, {hit['auteur']}, {hit['date'][:10]})")
+    return results
+
+
 # TD6 demo
 
 def run_td6(corpus: Corpus):
@@ -110,6 +177,8 @@ def run_td6(corpus: Corpus):
 def run_td7(corpus: Corpus):
     print("\n================ TD7 ================")
     print("[TD7] Building SearchEngine (vocab + TF + TF-IDF matrices)...")
+    from SearchEngine import SearchEngine
+
     engine = SearchEngine(corpus)
 
     query = "climate change"
@@ -123,14 +192,28 @@ def run_td7(corpus: Corpus):
 
 # Main
 
-def main():
-    print("=== Projet Python v2 (TD3 -> TD7) ===")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Projet Python v2 (TD3 -> TD7)")
+    parser.add_argument("--tsv", default="corpus_td4_td5.tsv", help="corpus TSV")
+    parser.add_argument("-q", "--query", help="run one search and exit (cached index)")
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--rebuild", action="store_true", help="ignore <tsv>.cache/")
+    return parser.parse_args(argv)
+
 
+def main(argv=None):
+    args = parse_args(argv)
     # Your file name:
-    tsv_path = "corpus_td4_td5.tsv"
+    tsv_path = args.tsv
+
+    if args.query:
+        run_query(tsv_path, args.query, top_n=args.top_n, rebuild=args.rebuild)
+        return
+
+    print("=== Projet Python v2 (TD3 -> TD7) ===")
 
     # Load corpus
-    corpus = load_corpus_from_tsv(tsv_path, corpus_name="Corpus v2 (TD3->TD7)")
+    corpus = load_corpus_cached(tsv_path, corpus_name="Corpus v2 (TD3->TD7)", rebuild=args.rebuild)
     print(f"\n[INFO] Corpus chargé: ndoc={corpus.ndoc}, naut={corpus.naut}")
 
     # TD4 display
@@ -150,4 +233,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,210 @@
+# mapreduce.py
+"""
+Map-reduce over document chunks for corpus analytics (TD6 stats, TD9-10 Explorer).
+
+    result = run(corpus, TokenCounts(), processes=4)
+
+An analysis is a subclass of Analysis:
+- map(docs): partial result for one chunk of documents (runs in a worker)
+- reduce(acc, part): merge two partial results (Counter / sparse-matrix sums)
+- finalize(acc): turn the merged result into what the caller wants
+- with_ids = True: map gets (doc_id, document) pairs instead of documents
+
+Doc ids are split into chunks of `chunksize`; with processes > 1 the chunks
+are mapped by a process pool (the corpus and the analysis are handed to each
+worker once, at start-up) and partial results are reduced in chunk order, so
+the output does not depend on the number of processes.
+processes=None or 1 runs the same chunks serially in the current process.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from Document import is_unknown_date
+from profiling import count, stage
+
+
+def tokens(corpus, text: str) -> List[str]:
+    """Same tokenization as Corpus.stats / Explorer: nettoyer_texte + split."""
+    cleaned = corpus.nettoyer_texte(text)
+    return cleaned.split() if cleaned else []
+
+
+class Analysis(ABC):
+    """Extension point: implement map / reduce (and override finalize if needed)."""
+
+    with_ids = False
+
+    @abstractmethod
+    def map(self, corpus, docs: list) -> Any:
+        """Partial result of one chunk of documents."""
+
+    @abstractmethod
+    def reduce(self, acc: Any, part: Any) -> Any:
+        """Merge a partial result into the accumulator."""
+
+    def finalize(self, acc: Any) -> Any:
+        return acc
+
+    def empty(self) -> Any:
+        """Result for a corpus without documents."""
+        return self.map(None, [])
+
+
+class TokenCounts(Analysis):
+    """(term frequency, document frequency) Counters over the whole corpus."""
+
+    def map(self, corpus, docs):
+        tf: Counter = Counter()
+        df: Counter = Counter()
+        for doc in docs:
+            toks = tokens(corpus, doc.texte)
+            if not toks:
+                continue
+            tf.update(toks)
+            df.update(set(toks))
+        return tf, df
+
+    def reduce(self, acc, part):
+        acc[0].update(part[0])
+        acc[1].update(part[1])
+        return acc
+
+
+class FieldCounts(Analysis):
+    """
+    Per value of a document field ('type' -> getType(), or an attribute such
+    as 'auteur'): (token Counter, total tokens), restricted to `values`.
+    """
+
+    def __init__(self, field: str, values: Sequence[str]):
+        self.field = field
+        self.values = tuple(values)
+
+    def _value(self, doc):
+        return doc.getType() if self.field == "type" else getattr(doc, self.field, None)
+
+    def map(self, corpus, docs):
+        out: Dict[str, list] = {v: [Counter(), 0] for v in self.values}
+        for doc in docs:
+            slot = out.get(self._value(doc))
+            if slot is None:
+                continue
+            toks = tokens(corpus, doc.texte)
+            slot[0].update(toks)
+            slot[1] += len(toks)
+        return out
+
+    def reduce(self, acc, part):
+        for t, (counts, total) in part.items():
+            acc[t][0].update(counts)
+            acc[t][1] += total
+        return acc
+
+
+class TypeCounts(FieldCounts):
+    """Per document type: (token Counter, total tokens), restricted to `types`."""
+
+    def __init__(self, types: Sequence[str]):
+        super().__init__("type", types)
+        self.types = self.values
+
+
+class TermHits(Analysis):
+    """
+    Occurrences of one term and total tokens, summed per document date
+    (documents with an unknown date are left out).
+    """
+
+    def __init__(self, term: str):
+        self.term = term
+
+    def map(self, corpus, docs):
+        per_date: Dict[datetime, list] = {}
+        for doc in docs:
+            dt = doc.date
+            if is_unknown_date(dt):
+                continue
+            toks = tokens(corpus, doc.texte)
+            if not toks:
+                continue
+            slot = per_date.setdefault(dt, [0, 0])
+            slot[0] += toks.count(self.term)
+            slot[1] += len(toks)
+        return per_date
+
+    def reduce(self, acc, part):
+        for dt, (hits, total) in part.items():
+            slot = acc.setdefault(dt, [0, 0])
+            slot[0] += hits
+            slot[1] += total
+        return acc
+
+
+# Executor
+
+_worker_corpus = None
+_worker_analysis: Optional[Analysis] = None
+
+
+def _init_worker(corpus, analysis: Analysis) -> None:
+    global _worker_corpus, _worker_analysis
+    _worker_corpus = corpus
+    _worker_analysis = analysis
+
+
+def _docs(corpus, analysis: Analysis, doc_ids: List[int]) -> list:
+    id2doc = corpus.id2doc
+    if analysis.with_ids:
+        return [(i, id2doc[i]) for i in doc_ids]
+    return [id2doc[i] for i in doc_ids]
+
+
+def _map_chunk(doc_ids: List[int]):
+    return _worker_analysis.map(_worker_corpus, _docs(_worker_corpus, _worker_analysis, doc_ids))
+
+
+def _chunks(doc_ids: List[int], size: int) -> Iterator[List[int]]:
+    for i in range(0, len(doc_ids), size):
+        yield doc_ids[i:i + size]
+
+
+def run(
+    corpus,
+    analysis: Analysis,
+    processes: Optional[int] = None,
+    chunksize: int = 2000,
+    doc_ids: Optional[Sequence[int]] = None,
+) -> Any:
+    """
+    Map `analysis` over chunks of doc ids (all of corpus.id2doc by default,
+    in insertion order) and reduce the partial results in chunk order.
+    """
+    ids = list(corpus.id2doc) if doc_ids is None else list(doc_ids)
+    count("mapreduce.docs", len(ids))
+    if not ids:
+        return analysis.finalize(analysis.empty())
+
+    chunks = list(_chunks(ids, max(1, chunksize)))
+    count("mapreduce.chunks", len(chunks))
+    acc = None
+    if processes is None or processes <= 1 or len(chunks) == 1:
+        for chunk in chunks:
+            with stage("mapreduce.map"):
+                part = analysis.map(corpus, _docs(corpus, analysis, chunk))
+            with stage("mapreduce.reduce"):
+                acc = part if acc is None else analysis.reduce(acc, part)
+    else:
+        import multiprocessing as mp
+
+        ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+        with ctx.Pool(processes, initializer=_init_worker, initargs=(corpus, analysis)) as pool:
+            with stage("mapreduce.map"):
+                parts = pool.imap(_map_chunk, chunks)
+                for part in parts:
+                    with stage("mapreduce.reduce"):
+                        acc = part if acc is None else analysis.reduce(acc, part)
+    return analysis.finalize(acc)
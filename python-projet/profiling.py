@@ -0,0 +1,147 @@
+# profiling.py
+"""
+Opt-in instrumentation of the hot paths (search, index build, corpus load,
+Explorer).
+
+    from profiling import profile
+    with profile() as prof:
+        engine.search("america freedom")
+    prof.stats()                       # per-stage timings (DataFrame)
+    prof.counters                      # docs scored, nnz touched, cache hits...
+    prof.to_chrome_trace("trace.json")  # open in chrome://tracing / Perfetto
+
+Instrumented code calls `stage(name)`, `count(name, n)` or decorates a whole
+method with `@timed(name)`. When no profiler is active they return a shared
+no-op context / return immediately, so the cost is one global lookup per call.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Dict, List, Optional
+
+_NULL = nullcontext()
+_active: Optional["Profiler"] = None
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof: "Profiler", name: str):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        self.prof.spans.append((self.name, self.t0, t1 - self.t0, threading.get_ident()))
+        return False
+
+
+class Profiler:
+    """Collects (stage, start, duration, thread) spans and named counters."""
+
+    def __init__(self):
+        self.t_origin = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.counters: Counter = Counter()
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def stats(self):
+        """One row per stage: calls, total / mean / max milliseconds."""
+        import pandas as pd
+
+        agg: Dict[str, list] = {}
+        for name, _, dur, _ in self.spans:
+            a = agg.setdefault(name, [0, 0.0, 0.0])
+            a[0] += 1
+            a[1] += dur
+            a[2] = max(a[2], dur)
+        rows = [{"stage": name, "calls": n, "total_ms": tot * 1e3, "mean_ms": tot / n * 1e3, "max_ms": mx * 1e3}
+                for name, (n, tot, mx) in agg.items()]
+        df = pd.DataFrame(rows, columns=["stage", "calls", "total_ms", "mean_ms", "max_ms"])
+        return df.sort_values("total_ms", ascending=False).reset_index(drop=True)
+
+    def to_dict(self) -> dict:
+        """Plain structure (stages + counters), e.g. for json.dump."""
+        return {
+            "stages": self.stats().to_dict(orient="records"),
+            "counters": dict(self.counters),
+        }
+
+    def to_chrome_trace(self, path: Optional[str] = None) -> dict:
+        """Chrome trace-event format ('X' complete events + final counter values)."""
+        pid = os.getpid()
+        events = []
+        end = self.t_origin
+        for name, t0, dur, tid in self.spans:
+            events.append({
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (t0 - self.t_origin) * 1e6,
+                "dur": dur * 1e6,
+                "pid": pid,
+                "tid": tid,
+            })
+            end = max(end, t0 + dur)
+        for name, value in self.counters.items():
+            events.append({"name": name, "ph": "C", "ts": (end - self.t_origin) * 1e6,
+                           "pid": pid, "args": {"value": value}})
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(trace, f)
+        return trace
+
+
+@contextmanager
+def profile(profiler: Optional[Profiler] = None):
+    """Activate a profiler for the duration of the block (nesting restores the outer one)."""
+    global _active
+    prof = profiler or Profiler()
+    outer, _active = _active, prof
+    try:
+        yield prof
+    finally:
+        _active = outer
+
+
+def stage(name: str):
+    prof = _active
+    if prof is None:
+        return _NULL
+    return _Stage(prof, name)
+
+
+def count(name: str, n: int = 1) -> None:
+    prof = _active
+    if prof is not None:
+        prof.counters[name] += n
+
+
+def timed(name: str):
+    """Decorator: record each call of the function as one `name` stage."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            prof = _active
+            if prof is None:
+                return fn(*args, **kwargs)
+            with _Stage(prof, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
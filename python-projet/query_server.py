@@ -0,0 +1,479 @@
+# query_server.py
+"""
+Local multi-process query server over a published, memory-mapped index.
+
+    python query_server.py publish corpus_td4_td5.tsv indexes/
+    python query_server.py publish big_corpus.tsv indexes/ --memory-limit-mb 256
+    python query_server.py serve indexes/ --workers 4 --port 8765
+    python query_server.py loadtest http://127.0.0.1:8765 --clients 8 --duration 5
+    python query_server.py scaling indexes/ --workers 1 2 4
+
+- publish_index() writes a versioned snapshot (CSC arrays of the L2-normalized
+  TF-IDF matrix, vocabulary, idf, metadata blob) and flips indexes/CURRENT.
+- serve() binds one listening socket and forks N workers that accept on it
+  (pre-fork). Every worker maps the snapshot read-only (np.load mmap_mode='r'),
+  so the index pages are shared through the page cache.
+- the listen backlog is the bounded request queue; POST /search accepts a list
+  of queries scored together (one sparse product for the batch).
+- reload is graceful: workers check CURRENT before each request and map the new
+  version; in-flight requests finish on the old mapping.
+
+Unix only (os.fork).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
+from Corpus import Corpus
+
+CURRENT = "CURRENT"
+
+
+# Snapshot
+
+def start_version(root: str):
+    """(version, temporary directory) for a new index version under root."""
+    os.makedirs(root, exist_ok=True)
+    version = datetime.now().strftime("v%Y%m%d-%H%M%S-%f")
+    tmp = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp)
+    return version, tmp
+
+
+def doc_metadata(doc) -> bytes:
+    """One meta.bin record: the result columns of a document as JSON."""
+    return json.dumps({
+        "titre": doc.titre,
+        "auteur": doc.auteur,
+        "date": doc.date.isoformat(),
+        "type": doc.getType(),
+        "url": doc.url,
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def finish_version(root: str, version: str, tmp: str, manifest: dict) -> str:
+    """Write the manifest, move the version in place and make it current."""
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, **manifest}, f)
+
+    final = os.path.join(root, version)
+    os.rename(tmp, final)
+    pointer = os.path.join(root, CURRENT + ".tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT))
+    return final
+
+
+def publish_index(engine, root: str) -> str:
+    """Write a new index version under `root` and make it current. Returns its path."""
+    version, tmp = start_version(root)
+
+    mat = csc_matrix(engine.normalized(use_tfidf=True)[1], dtype=np.float32)
+    mat.sort_indices()
+
+    words = sorted(engine.vocab, key=lambda w: engine.vocab[w]["id"])
+    idf = np.array([engine.vocab[w]["idf"] for w in words], dtype=np.float32)
+
+    np.save(os.path.join(tmp, "data.npy"), mat.data)
+    np.save(os.path.join(tmp, "indices.npy"), mat.indices.astype(np.int32))
+    np.save(os.path.join(tmp, "indptr.npy"), mat.indptr.astype(np.int64))
+    np.save(os.path.join(tmp, "vocab.npy"), np.array(words if words else [""], dtype=str))
+    np.save(os.path.join(tmp, "idf.npy"), idf)
+    np.save(os.path.join(tmp, "doc_ids.npy"), np.array(engine.doc_ids, dtype=np.int64))
+
+    # metadata: one JSON object per row in a single blob + offsets
+    offsets = [0]
+    with open(os.path.join(tmp, "meta.bin"), "wb") as f:
+        for doc_id in engine.doc_ids:
+            blob = doc_metadata(engine.corpus.id2doc[doc_id])
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(os.path.join(tmp, "meta_offsets.npy"), np.array(offsets, dtype=np.int64))
+
+    return finish_version(root, version, tmp, {"N": mat.shape[0], "V": len(words), "nnz": int(mat.nnz)})
+
+
+def prune_versions(root: str, keep: int = 2) -> List[str]:
+    """Delete all but the `keep` newest versions (mapped files stay valid for readers)."""
+    versions = sorted(d for d in os.listdir(root) if d.startswith("v") and os.path.isdir(os.path.join(root, d)))
+    removed = versions[:-keep] if keep > 0 else versions
+    for d in removed:
+        shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+    return removed
+
+
+class IndexSnapshot:
+    """Read-only, memory-mapped view of one published index version."""
+
+    def __init__(self, path: str):
+        self.path = path
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self.N = self.manifest["N"]
+        self.V = self.manifest["V"]
+        self.data = load("data.npy")
+        self.indices = load("indices.npy")
+        self.indptr = load("indptr.npy")
+        self.vocab = load("vocab.npy")
+        self.idf = load("idf.npy")
+        self.doc_ids = load("doc_ids.npy")
+        self.meta_offsets = load("meta_offsets.npy")
+        self.meta = np.memmap(os.path.join(path, "meta.bin"), dtype=np.uint8, mode="r") \
+            if self.meta_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def current(cls, root: str) -> "IndexSnapshot":
+        with open(os.path.join(root, CURRENT), "r", encoding="utf-8") as f:
+            return cls(os.path.join(root, f.read().strip()))
+
+    def _term_ids(self, query: str) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        cleaned = Corpus.nettoyer_texte(query)
+        for w in cleaned.split() if cleaned else []:
+            j = int(np.searchsorted(self.vocab, w))
+            if j < self.V and self.vocab[j] == w:
+                counts[j] = counts.get(j, 0) + 1
+        return counts
+
+    def _metadata(self, row: int) -> dict:
+        start, end = int(self.meta_offsets[row]), int(self.meta_offsets[row + 1])
+        return json.loads(bytes(self.meta[start:end]).decode("utf-8"))
+
+    def search_batch(self, queries: Sequence[str], top_n: int = 10) -> List[List[dict]]:
+        """
+        Score all queries with one sparse product restricted to the columns
+        they use: (N x k) @ (k x B).
+        """
+        terms = [self._term_ids(q) for q in queries]
+        cols = sorted({j for t in terms for j in t})
+        results: List[List[dict]] = [[] for _ in queries]
+        if not cols or self.N == 0:
+            return results
+
+        pos = {j: k for k, j in enumerate(cols)}
+        q_rows, q_cols, q_vals = [], [], []
+        for b, t in enumerate(terms):
+            if not t:
+                continue
+            w = np.array([c * float(self.idf[j]) for j, c in t.items()])
+            w /= np.linalg.norm(w)
+            q_rows.extend(pos[j] for j in t)
+            q_cols.extend([b] * len(t))
+            q_vals.extend(w)
+        Q = csr_matrix((q_vals, (q_rows, q_cols)), shape=(len(cols), len(queries)))
+
+        # column slices of the mapped CSC matrix
+        starts = [int(self.indptr[j]) for j in cols]
+        ends = [int(self.indptr[j + 1]) for j in cols]
+        sub_indptr = np.concatenate([[0], np.cumsum(np.subtract(ends, starts))])
+        sub_indices = np.concatenate([self.indices[s:e] for s, e in zip(starts, ends)])
+        sub_data = np.concatenate([self.data[s:e] for s, e in zip(starts, ends)])
+        sub = csc_matrix((sub_data, sub_indices, sub_indptr), shape=(self.N, len(cols)))
+
+        scores = (sub @ Q).toarray()  # N x B
+        k = min(top_n, self.N)
+        for b in range(len(queries)):
+            if not terms[b]:
+                continue
+            col = scores[:, b]
+            top = np.argpartition(-col, k - 1)[:k]
+            top = top[np.argsort(-col[top], kind="stable")]
+            for i in top:
+                results[b].append({"doc_id": int(self.doc_ids[i]), "score": float(col[i]), **self._metadata(i)})
+        return results
+
+    def search(self, query: str, top_n: int = 10) -> List[dict]:
+        return self.search_batch([query], top_n=top_n)[0]
+
+
+# Server
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "TD-QueryServer/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _top_n(self, value, snap: IndexSnapshot) -> int:
+        """top_n of a request, clamped to [1, N]; ValueError / TypeError if not an integer."""
+        return min(max(int(value), 1), max(snap.N, 1))
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        snap = self.server.snapshot()
+        if url.path == "/health":
+            self._send(200, {"version": snap.version, "pid": os.getpid(), "N": snap.N})
+        elif url.path == "/search":
+            q = params.get("q", [""])[0]
+            try:
+                top_n = self._top_n(params.get("top_n", ["10"])[0], snap)
+            except (ValueError, TypeError) as e:
+                self._send(400, {"error": f"bad request: {e}"})
+                return
+            self._send(200, {"version": snap.version, "results": snap.search(q, top_n)})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path != "/search":
+            self._send(404, {"error": "not found"})
+            return
+        snap = self.server.snapshot()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            queries = [str(q) for q in req["queries"]]
+            top_n = self._top_n(req.get("top_n", 10), snap)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"bad request: {e}"})
+            return
+        if len(queries) > self.server.max_batch:
+            self._send(413, {"error": f"at most {self.server.max_batch} queries per batch"})
+            return
+        self._send(200, {"version": snap.version, "results": snap.search_batch(queries, top_n)})
+
+
+class _WorkerServer(HTTPServer):
+    """One worker: accepts on the inherited socket, remaps on version change."""
+
+    def __init__(self, sock: socket.socket, root: str, max_batch: int):
+        super().__init__(sock.getsockname()[:2], _Handler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.root = root
+        self.max_batch = max_batch
+        self._pointer = os.path.join(root, CURRENT)
+        self._stamp = None
+        self._snapshot: Optional[IndexSnapshot] = None
+
+    def snapshot(self) -> IndexSnapshot:
+        stamp = os.stat(self._pointer).st_mtime_ns
+        if stamp != self._stamp:
+            snap = IndexSnapshot.current(self.root)
+            if self._snapshot is None or snap.version != self._snapshot.version:
+                self._snapshot = snap
+            self._stamp = stamp
+        return self._snapshot
+
+
+def _worker(sock: socket.socket, root: str, max_batch: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    server = _WorkerServer(sock, root, max_batch)
+    server.snapshot()
+    server.serve_forever()
+
+
+def serve(root: str, host: str = "127.0.0.1", port: int = 8765, workers: int = 0,
+          backlog: int = 128, max_batch: int = 64, ready=None) -> None:
+    """
+    Pre-fork server. workers=0 -> one per core. `backlog` bounds the queue of
+    pending connections. `ready(port)` is called once workers are forked.
+    Blocks until SIGINT/SIGTERM, then stops the workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    IndexSnapshot.current(root)  # fail early if nothing is published
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker(sock, root, max_batch)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    stopping = []
+
+    def stop(*_):
+        stopping.append(True)
+
+    old_int = signal.signal(signal.SIGINT, stop)
+    old_term = signal.signal(signal.SIGTERM, stop)
+    try:
+        if ready is not None:
+            ready(sock.getsockname()[1])
+        while not stopping and pids:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                pids.remove(pid)
+            time.sleep(0.2)
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
+        signal.signal(signal.SIGINT, old_int)
+        signal.signal(signal.SIGTERM, old_term)
+
+
+# Load test
+
+def _client(args) -> List[float]:
+    url, queries, deadline, batch, top_n = args
+    lat = []
+    k = 0
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        if batch > 1:
+            chunk = [queries[(k + i) % len(queries)] for i in range(batch)]
+            body = json.dumps({"queries": chunk, "top_n": top_n}).encode("utf-8")
+            req = urllib.request.Request(url + "/search", data=body, headers={"Content-Type": "application/json"})
+        else:
+            q = urllib.parse.quote(queries[k % len(queries)])
+            req = url + f"/search?q={q}&top_n={top_n}"
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+        lat.append(time.perf_counter() - t0)
+        k += batch
+    return lat
+
+
+def loadtest(url: str, queries: Sequence[str], clients: int = 8, duration: float = 5.0,
+             batch: int = 1, top_n: int = 10) -> dict:
+    """Closed-loop load from `clients` processes; returns QPS and latency percentiles."""
+    from multiprocessing import Pool
+
+    deadline = time.time() + duration
+    with Pool(clients) as pool:
+        t0 = time.time()
+        lats = pool.map(_client, [(url.rstrip("/"), list(queries), deadline, batch, top_n)] * clients)
+        elapsed = time.time() - t0
+    lat = np.array([x for part in lats for x in part]) if any(lats) else np.zeros(1)
+    return {
+        "clients": clients,
+        "batch": batch,
+        "requests": int(sum(len(x) for x in lats)),
+        "qps": sum(len(x) for x in lats) * batch / elapsed,
+        "p50_ms": float(np.percentile(lat, 50) * 1e3),
+        "p99_ms": float(np.percentile(lat, 99) * 1e3),
+    }
+
+
+def scaling(root: str, workers: Sequence[int], queries: Sequence[str], clients: int = 0,
+            duration: float = 5.0, batch: int = 1):
+    """Start the server with each worker count in turn and load-test it."""
+    import multiprocessing as mp
+    import pandas as pd
+
+    rows = []
+    for n in workers:
+        ctx = mp.get_context("fork")
+        port_q = ctx.Queue()
+        proc = ctx.Process(target=serve, kwargs={"root": root, "port": 0, "workers": n, "ready": port_q.put})
+        proc.start()
+        try:
+            port = port_q.get(timeout=30)
+            res = loadtest(f"http://127.0.0.1:{port}", queries, clients=clients or max(2, 2 * n),
+                           duration=duration, batch=batch)
+            rows.append({"workers": n, **res})
+        finally:
+            os.kill(proc.pid, signal.SIGTERM)
+            proc.join()
+    return pd.DataFrame(rows)
+
+
+DEFAULT_QUERIES = ["america freedom", "economy jobs", "climate change", "health care",
+                   "war", "tax cuts families", "president", "security border"]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Multi-process query server")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("publish", help="build a SearchEngine from a corpus and publish it")
+    p.add_argument("corpus", help="corpus file (csv/tsv from Corpus.save, or .pkl)")
+    p.add_argument("root")
+    p.add_argument("--keep", type=int, default=2, help="versions to keep")
+    p.add_argument("--memory-limit-mb", type=float, default=None,
+                   help="stream a csv/tsv corpus through the out-of-core builder (external_build)")
+
+    p = sub.add_parser("serve")
+    p.add_argument("root")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--workers", type=int, default=0)
+    p.add_argument("--backlog", type=int, default=128)
+
+    p = sub.add_parser("loadtest")
+    p.add_argument("url")
+    p.add_argument("--clients", type=int, default=8)
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--batch", type=int, default=1)
+
+    p = sub.add_parser("scaling")
+    p.add_argument("root")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--batch", type=int, default=1)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "publish":
+        from SearchEngine import SearchEngine
+        fmt = "pickle" if args.corpus.endswith((".pkl", ".pickle")) else "csv"
+        if args.memory_limit_mb is not None and fmt == "csv":
+            from external_build import build_index_external, iter_tsv_documents
+            path = build_index_external(iter_tsv_documents(args.corpus), args.root,
+                                        memory_limit_mb=args.memory_limit_mb)
+        else:
+            corpus = Corpus.load("published", args.corpus, format_type=fmt)
+            path = publish_index(SearchEngine(corpus), args.root)
+        prune_versions(args.root, keep=args.keep)
+        print(f"published {path}")
+    elif args.cmd == "serve":
+        serve(args.root, args.host, args.port, args.workers, args.backlog,
+              ready=lambda port: print(f"serving on http://{args.host}:{port}", flush=True))
+    elif args.cmd == "loadtest":
+        print(loadtest(args.url, DEFAULT_QUERIES, args.clients, args.duration, args.batch))
+    elif args.cmd == "scaling":
+        print(scaling(args.root, args.workers, DEFAULT_QUERIES, duration=args.duration,
+                      batch=args.batch).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# regex_prefilter.py
+"""
+TD6 concordancer helper: required literals of a regex.
+
+required_literals(pattern) walks the parsed pattern (re's own parser) and
+returns the literals any match must contain, as an AND of OR-groups, plus
+whether they must be looked up in lowercased text:
+    r"\bamerica\b"          -> ([("america",)], False)
+    r"(free|liberty)dom"    -> ([("free", "liberty"), ("dom",)], False)
+Documents that miss one group can be skipped before running the regex.
+Case-insensitive literals are compared after fold(), which maps both the text
+and the literals onto re's own IGNORECASE equivalences ("ſ" -> "s", Kelvin
+sign -> "k", final sigma...), not just str.lower().
+It returns None when the pattern has no usable literal, or when running it
+document by document could change the result (anchors other than \b, lookahead,
+anything that can match the '\n' separating documents in the corpus text).
+"""
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Tuple
+
+try:  # Python >= 3.11
+    import re._parser as sre_parse
+    from re._constants import (ANY, ASSERT, ASSERT_NOT, AT, AT_BOUNDARY, AT_NON_BOUNDARY, BRANCH,
+                               CATEGORY, CATEGORY_LINEBREAK, CATEGORY_NOT_DIGIT, CATEGORY_NOT_WORD,
+                               CATEGORY_SPACE, IN, LITERAL, MAX_REPEAT, MIN_REPEAT, NEGATE, NOT_LITERAL,
+                               RANGE, SUBPATTERN)
+except ImportError:  # Python 3.10
+    import sre_parse
+    from sre_constants import (ANY, ASSERT, ASSERT_NOT, AT, AT_BOUNDARY, AT_NON_BOUNDARY, BRANCH,
+                               CATEGORY, CATEGORY_LINEBREAK, CATEGORY_NOT_DIGIT, CATEGORY_NOT_WORD,
+                               CATEGORY_SPACE, IN, LITERAL, MAX_REPEAT, MIN_REPEAT, NEGATE, NOT_LITERAL,
+                               RANGE, SUBPATTERN)
+
+_NL = ord("\n")
+_NEWLINE_CATEGORIES = {CATEGORY_SPACE, CATEGORY_NOT_DIGIT, CATEGORY_NOT_WORD, CATEGORY_LINEBREAK}
+_REPEATS = {MAX_REPEAT, MIN_REPEAT}
+try:
+    from re._constants import POSSESSIVE_REPEAT
+    _REPEATS.add(POSSESSIVE_REPEAT)
+except ImportError:
+    pass
+
+Requirement = Tuple[str, ...]
+
+
+def _fold_table() -> Optional[dict]:
+    """
+    Code point -> representative of its re IGNORECASE class, for the
+    lowercase characters re treats as equal beyond simple lowercasing.
+    None if the interpreter's table is not available.
+    """
+    try:  # Python >= 3.11
+        from re._casefix import _EXTRA_CASES
+        classes = [(c,) + tuple(others) for c, others in _EXTRA_CASES.items()]
+    except ImportError:
+        try:  # Python 3.10
+            from sre_compile import _equivalences as classes
+        except ImportError:
+            return None
+    table = {}
+    for cls in classes:
+        rep = min(cls)
+        for c in cls:
+            table[c] = min(table.get(c, rep), rep)
+    return table
+
+
+_FOLD = _fold_table()
+
+
+def fold(text: str) -> Optional[str]:
+    """
+    Text with every character replaced by its re IGNORECASE class
+    representative, same length as `text` (offsets stay valid); None when
+    that is not possible (a character lowercasing to several, no table).
+    """
+    low = text.lower()
+    if len(low) != len(text):
+        return None
+    if _FOLD is None:
+        return low if low.isascii() else None
+    return low.translate(_FOLD)
+
+
+class _Unsafe(Exception):
+    pass
+
+
+def _set_has_newline(items) -> bool:
+    negate = False
+    hit = False
+    for op, av in items:
+        if op is NEGATE:
+            negate = True
+        elif op is LITERAL:
+            hit |= av == _NL
+        elif op is RANGE:
+            hit |= av[0] <= _NL <= av[1]
+        elif op is CATEGORY:
+            hit |= str(av).replace("_UNI", "").replace("_LOC", "") in {str(c) for c in _NEWLINE_CATEGORIES}
+        else:
+            hit = True  # unknown item: be conservative
+    return hit != negate
+
+
+def _walk(seq, flags: int, folded: list) -> List[Requirement]:
+    """
+    Requirements of a sequence; raises _Unsafe for patterns the prefilter
+    can't handle. folded gets an entry if a literal sits under IGNORECASE.
+    """
+    reqs: List[Requirement] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            reqs.append(("".join(run),))
+            run.clear()
+
+    for op, av in seq:
+        if op is LITERAL:
+            if av == _NL:
+                raise _Unsafe
+            if flags & re.IGNORECASE:
+                folded.append(True)
+            run.append(chr(av))
+            continue
+        flush()
+        if op is NOT_LITERAL:
+            if av != _NL:
+                raise _Unsafe
+        elif op is ANY:
+            if flags & re.DOTALL:
+                raise _Unsafe
+        elif op is IN:
+            if _set_has_newline(av):
+                raise _Unsafe
+        elif op is AT:
+            if av not in (AT_BOUNDARY, AT_NON_BOUNDARY):
+                raise _Unsafe
+        elif op is SUBPATTERN:
+            group_flags = (flags | av[1]) & ~av[2]
+            reqs.extend(_walk(av[-1], group_flags, folded))
+        elif op in _REPEATS:
+            lo, _, item = av
+            inner = _walk(item, flags, folded)
+            if lo >= 1:
+                reqs.extend(inner)
+        elif op is BRANCH:
+            alts = [_walk(alt, flags, folded) for alt in av[1]]
+            if all(alts):
+                best = [max((r for r in a), key=lambda r: min(len(x) for x in r)) for a in alts]
+                reqs.append(tuple(sorted({x for r in best for x in r})))
+        elif op in (ASSERT, ASSERT_NOT):
+            if av[0] >= 0:  # lookahead may look past the end of a document
+                raise _Unsafe
+        else:
+            # backreferences, conditionals...: no literal information, but safe
+            # only if they cannot reach '\n'; stay conservative
+            raise _Unsafe
+    flush()
+    return reqs
+
+
+def required_literals(pattern: "re.Pattern", min_len: int = 2) -> Optional[Tuple[List[Requirement], bool]]:
+    """
+    (AND-of-OR literal groups, casefold) or None (no fast path).
+    casefold=True when any literal is case-insensitive: every literal is then
+    folded (fold()) and must be searched in the folded text.
+    """
+    if pattern.flags & re.MULTILINE:
+        return None
+    folded: list = []
+    try:
+        reqs = _walk(sre_parse.parse(pattern.pattern, pattern.flags), pattern.flags, folded)
+    except (_Unsafe, re.error):
+        return None
+    casefold = bool(folded)
+    if casefold:
+        folded_reqs = [tuple(fold(x) for x in r) for r in reqs]
+        if any(x is None for r in folded_reqs for x in r):
+            return None
+        reqs = [tuple(sorted(set(r))) for r in folded_reqs]
+    reqs = [r for r in reqs if min(len(x) for x in r) >= min_len]
+    if not reqs:
+        return None
+    # most selective first: longest shortest-alternative
+    return sorted(set(reqs), key=lambda r: -min(len(x) for x in r)), casefold
@@ -0,0 +1,249 @@
+# sharding.py
+"""
+Sharded Corpus / SearchEngine with scatter-gather search.
+
+    sharded = ShardedCorpus.from_corpus(corpus, k=4, scheme="hash")
+    engine = ShardedSearchEngine(sharded)      # one process per shard
+    engine.search("america freedom", top_n=10)
+    engine.close()
+
+Each shard holds its own Corpus and local SearchEngine. Document frequencies
+are merged once into collection-wide statistics and pushed back to every shard
+(SearchEngine.set_collection_stats), and query weights are computed by the
+coordinator with the global idf, so scores are identical to a single
+SearchEngine over the whole corpus. Each shard returns its local top-k and the
+coordinator merges them with a heap.
+processes=False keeps every shard in the current process (debugging, tests).
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Corpus import Corpus
+
+RESULT_COLUMNS = ["doc_id", "score", "titre", "auteur", "date", "type", "url"]
+
+
+class ShardedCorpus:
+    """K Corpus partitions; shard_ids[s][local_id] is the global doc id."""
+
+    def __init__(self, nom: str, shards: List[Corpus], shard_ids: List[Dict[int, int]]):
+        self.nom = nom
+        self.shards = shards
+        self.shard_ids = shard_ids
+        self.ndoc = sum(s.ndoc for s in shards)
+
+    @staticmethod
+    def shard_of(doc_id: int, k: int) -> int:
+        return zlib.crc32(str(doc_id).encode("ascii")) % k
+
+    @classmethod
+    def from_corpus(cls, corpus: Corpus, k: int, scheme: str = "hash") -> "ShardedCorpus":
+        """
+        scheme='hash': stable crc32 of the doc id modulo k.
+        scheme='range': k contiguous ranges of sorted doc ids.
+        """
+        if k <= 0:
+            raise ValueError("k must be > 0")
+        doc_ids = sorted(corpus.id2doc)
+        if scheme == "hash":
+            assign = [cls.shard_of(d, k) for d in doc_ids]
+        elif scheme == "range":
+            size = max(1, math.ceil(len(doc_ids) / k))
+            assign = [min(i // size, k - 1) for i in range(len(doc_ids))]
+        else:
+            raise ValueError("scheme must be 'hash' or 'range'")
+
+        shards = [Corpus(f"{corpus.nom}#{s}") for s in range(k)]
+        shard_ids: List[Dict[int, int]] = [{} for _ in range(k)]
+        for doc_id, s in zip(doc_ids, assign):
+            local = shards[s].add_document(corpus.id2doc[doc_id])
+            shard_ids[s][local] = doc_id
+        return cls(corpus.nom, shards, shard_ids)
+
+
+class _Shard:
+    """Shard-side state: local engine + L2-normalized TF-IDF rows."""
+
+    def __init__(self, corpus: Corpus, global_ids: Dict[int, int]):
+        from SearchEngine import SearchEngine
+
+        self.engine = SearchEngine(corpus)
+        self.global_ids = np.array([global_ids[d] for d in self.engine.doc_ids], dtype=np.int64)
+        self.mat = None
+
+    def doc_freq(self) -> Tuple[int, Dict[str, int]]:
+        return self.engine.N, {w: info["df"] for w, info in self.engine.vocab.items()}
+
+    def set_collection_stats(self, n_docs: int, doc_freq: Dict[str, int]) -> None:
+        self.engine.set_collection_stats(n_docs, doc_freq)
+        self.mat = self.engine.normalized(use_tfidf=True)[1]
+
+    def search(self, weights: Dict[str, float], top_n: int) -> List[tuple]:
+        """Local top-k as (score, global doc id, metadata) tuples."""
+        vocab = self.engine.vocab
+        cols = [(vocab[w]["id"], x) for w, x in weights.items() if w in vocab]
+        if not cols or self.engine.N == 0:
+            return []
+        ids = [j for j, _ in cols]
+        q = np.array([x for _, x in cols])
+        scores = np.asarray(self.mat[:, ids] @ q).ravel()
+
+        k = min(top_n, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        out = []
+        for i in top:
+            doc = self.engine.corpus.id2doc[self.engine.doc_ids[i]]
+            out.append((float(scores[i]), int(self.global_ids[i]), {
+                "titre": doc.titre,
+                "auteur": doc.auteur,
+                "date": doc.date.isoformat(),
+                "type": doc.getType(),
+                "url": doc.url,
+            }))
+        return out
+
+
+def _shard_worker(conn, corpus: Corpus, global_ids: Dict[int, int]) -> None:
+    try:
+        shard = _Shard(corpus, global_ids)
+        conn.send(("ok", None))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    while True:
+        cmd, args = conn.recv()
+        if cmd == "stop":
+            return
+        try:
+            conn.send(("ok", getattr(shard, cmd)(*args)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _RemoteShard:
+    """Coordinator-side handle of a shard living in its own process."""
+
+    def __init__(self, ctx, corpus: Corpus, global_ids: Dict[int, int]):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_shard_worker, args=(child, corpus, global_ids), daemon=True)
+        self.proc.start()
+        child.close()
+
+    def send(self, cmd: str, *args) -> None:
+        self.conn.send((cmd, args))
+
+    def recv(self):
+        status, value = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"shard error: {value}")
+        return value
+
+    def close(self) -> None:
+        try:
+            self.conn.send(("stop", ()))
+        except (BrokenPipeError, OSError):
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.terminate()
+
+
+class _LocalShard:
+    """Same interface as _RemoteShard, in the current process."""
+
+    def __init__(self, corpus: Corpus, global_ids: Dict[int, int]):
+        self.shard = _Shard(corpus, global_ids)
+        self._pending = None
+
+    def send(self, cmd: str, *args) -> None:
+        self._pending = getattr(self.shard, cmd)(*args)
+
+    def recv(self):
+        value, self._pending = self._pending, None
+        return value
+
+    def close(self) -> None:
+        pass
+
+
+class ShardedSearchEngine:
+    """
+    Scatter-gather SearchEngine over a ShardedCorpus.
+    - vocab: word -> {"df", "idf"} merged over all shards
+    - search(query, top_n) returns the same DataFrame as SearchEngine.search
+    """
+
+    def __init__(self, sharded: ShardedCorpus, processes: bool = True):
+        self.sharded = sharded
+        if processes:
+            import multiprocessing as mp
+
+            ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+            self.shards = [_RemoteShard(ctx, c, ids) for c, ids in zip(sharded.shards, sharded.shard_ids)]
+            for sh in self.shards:
+                sh.recv()  # shard engine built
+        else:
+            self.shards = [_LocalShard(c, ids) for c, ids in zip(sharded.shards, sharded.shard_ids)]
+
+        # gather local df, merge, scatter global stats
+        for sh in self.shards:
+            sh.send("doc_freq")
+        self.N = 0
+        df: Counter = Counter()
+        for sh in self.shards:
+            n, local_df = sh.recv()
+            self.N += n
+            df.update(local_df)
+
+        self.vocab = {}
+        for w in sorted(df):
+            idf = math.log((self.N + 1) / (df[w] + 1)) + 1.0
+            self.vocab[w] = {"df": df[w], "idf": idf}
+
+        global_df = dict(df)
+        for sh in self.shards:
+            sh.send("set_collection_stats", self.N, global_df)
+        for sh in self.shards:
+            sh.recv()
+
+    def _weights(self, query: str) -> Optional[Dict[str, float]]:
+        cleaned = Corpus.nettoyer_texte(query)
+        tf = Counter(w for w in cleaned.split() if w in self.vocab) if cleaned else Counter()
+        if not tf:
+            return None
+        weights = {w: c * self.vocab[w]["idf"] for w, c in tf.items()}
+        norm = math.sqrt(sum(x * x for x in weights.values()))
+        return {w: x / norm for w, x in weights.items()}
+
+    def search(self, keywords: str, top_n: int = 10) -> pd.DataFrame:
+        """TD7 search, scattered to every shard; local top-k merged with a heap."""
+        weights = self._weights(keywords)
+        if weights is None:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+        for sh in self.shards:
+            sh.send("search", weights, top_n)
+        partials = [sh.recv() for sh in self.shards]
+
+        best = heapq.nlargest(top_n, (hit for part in partials for hit in part), key=lambda h: (h[0], -h[1]))
+        rows = [{"doc_id": doc_id, "score": score, **meta} for score, doc_id, meta in best]
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+    def close(self) -> None:
+        for sh in self.shards:
+            sh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,54 @@
+# test_autocomplete.py
+"""
+Prefix completion and fuzzy correction (autocomplete.Autocomplete).
+
+    python -m unittest test_autocomplete      (or: python -m pytest test_autocomplete.py)
+"""
+import unittest
+from datetime import datetime
+
+from Corpus import Corpus
+from Document import Document
+from SearchEngine import SearchEngine
+from autocomplete import Autocomplete, edit_distance
+
+TEXTS = [
+    "the president spoke about freedom",
+    "the president and the congress",
+    "presidential elections and freedom",
+    "preserve the union",
+]
+
+
+class AutocompleteTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        corpus = Corpus("t")
+        for texte in TEXTS:
+            corpus.add_document(Document("t", "A", datetime(2020, 1, 1), "", texte))
+        cls.ac = Autocomplete(SearchEngine(corpus))
+
+    def test_complete(self):
+        self.assertEqual(self.ac.complete("presid"), [("president", 2), ("presidential", 1)])
+        self.assertEqual(self.ac.complete("zz"), [])
+
+    def test_substitution_insertion_deletion(self):
+        for typo in ("presidant", "presiddent", "presdent"):
+            self.assertEqual(self.ac.correct(typo, n=1, max_dist=1)[0][:2], ("president", 1), typo)
+
+    def test_transposition(self):
+        self.assertEqual(edit_distance("presdient", "president", 1), 1)
+        for typo in ("presdient", "rpesident", "presidnet", "freedmo"):
+            best = self.ac.correct(typo, n=1, max_dist=1)
+            self.assertTrue(best, typo)
+            self.assertEqual(best[0][1], 1, typo)
+        self.assertEqual(self.ac.correct("presdient", n=1, max_dist=1)[0][0], "president")
+
+    def test_exact_and_query(self):
+        self.assertEqual(self.ac.correct("freedom", n=1)[0], ("freedom", 0, 2))
+        self.assertEqual(self.ac.correct_query("presdient freedmo"), "president freedom")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# test_concorde.py
+"""
+Corpus.concorde with the literal prefilter (regex_prefilter) must return
+exactly what a full finditer scan of the corpus text returns.
+
+    python -m unittest test_concorde      (or: python -m pytest test_concorde.py)
+"""
+import re
+import unittest
+from datetime import datetime
+
+from Corpus import Corpus
+from Document import Document
+from regex_prefilter import fold, required_literals
+
+TEXTS = [
+    "God bless America and God bless the United States of America.",
+    "Freedom is never more than one generation away from extinction.",
+    "The ſtate of the union is ſtrong; Liberty and FREEDOM for all.",  # long s
+    "A 5 Kelvin drop — the King said “freedom” again.",  # Kelvin sign, curly quotes
+    "ΣΟΦΙΑ και σοφία; ΟΔΟΣ, οδός.",  # final sigma
+    "Straße STRASSE strasse, über ÜBER.",
+    "jobs jobs jobs: we will bring back our jobs",
+    "",
+    "america\nfreedom",
+    "No match in this one at all.",
+]
+
+PATTERNS = [
+    r"america", r"\bamerica\b", r"god bless (america|the)", r"(free|liber)(dom|ty)",
+    r"state", r"\bstrong\b", r"king", r"kelvin", r"σοφια", r"σοφία", r"οδος", r"ΟΔΟΣ",
+    r"straße", r"über", r"jobs{1,2}", r"(?i:FREEDOM) for", r"freedom.{0,20}again",
+    r"[a-z]+dom", r"america\nfreedom", r"\w+ bless", r"ſtate", r"King",
+]
+
+
+class ConcordeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = Corpus("t")
+        for texte in TEXTS:
+            cls.corpus.add_document(Document("t", "A", datetime(2020, 1, 1), "", texte))
+        cls.text = "\n".join(TEXTS)
+
+    def full_scan(self, expr, ignore_case, context=30):
+        pattern = re.compile(expr, re.IGNORECASE if ignore_case else 0)
+        text = self.text
+        return [(text[max(0, m.start() - context):m.start()], m.group(0), text[m.end():m.end() + context])
+                for m in pattern.finditer(text)]
+
+    def test_matches_full_scan(self):
+        fast = 0
+        for expr in PATTERNS:
+            for ignore_case in (True, False):
+                with self.subTest(expr=expr, ignore_case=ignore_case):
+                    df = self.corpus.concorde(expr, ignore_case=ignore_case)
+                    got = list(zip(df["contexte gauche"], df["motif trouvé"], df["contexte droit"]))
+                    self.assertEqual(got, self.full_scan(expr, ignore_case))
+                    pattern = re.compile(expr, re.IGNORECASE if ignore_case else 0)
+                    fast += required_literals(pattern) is not None
+        self.assertGreater(fast, len(PATTERNS))  # the prefilter did run on most patterns
+
+    def test_fold_follows_re(self):
+        # every pair of characters re treats as equal under IGNORECASE folds the same
+        chars = "sSſkKKσςΣiIıµμΜßẞ"
+        for a in chars:
+            for b in chars:
+                if re.fullmatch(re.escape(a), b, re.IGNORECASE):
+                    self.assertEqual(fold(a), fold(b), (a, b))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# test_cooccurrence.py
+"""
+Co-occurrence matrices (cooccurrence.Cooccurrence): shared rows of
+SearchEngine(unique_texts=True) must count like separate documents, on the
+whole corpus and on subsets.
+
+    python -m unittest test_cooccurrence      (or: python -m pytest test_cooccurrence.py)
+"""
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from Corpus import Corpus
+from Document import Document, RedditDocument
+from SearchEngine import SearchEngine
+from cooccurrence import Cooccurrence
+
+DOCS = [  # (class, auteur, texte)
+    (Document, "A", "new new york city"),
+    (Document, "B", "new new york city"),  # same text as the first one: shared row
+    (RedditDocument, "B", "new new york city"),
+    (RedditDocument, "A", "big city lights in new york"),
+    (Document, "A", "city lights"),
+]
+
+
+class CooccurrenceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        corpus = Corpus("t")
+        for cls_, auteur, texte in DOCS:
+            corpus.add_document(cls_("t", auteur, datetime(2020, 1, 1), "", texte))
+        cls.plain = SearchEngine(corpus)
+        cls.shared = SearchEngine(corpus, unique_texts=True)
+        assert cls.shared.N == 3
+
+    def dense(self, engine, mode, **subset):
+        co = Cooccurrence(engine)
+        rows, weights = co.subset(**subset)
+        C, marginals, n = co.matrix(mode=mode, window=2, rows=rows, weights=weights)
+        words = sorted(engine.vocab, key=lambda w: engine.vocab[w]["id"])
+        pos = {w: i for i, w in enumerate(words)}
+        return C.toarray(), marginals, n, pos
+
+    def test_shared_rows_match_plain_engine(self):
+        subsets = [{}, {"auteur": "A"}, {"auteur": "B"}, {"type": "Reddit"},
+                   {"where": lambda d: d.auteur == "B" and d.getType() == "Document"}, {"doc_ids": [1, 4]}]
+        for mode in ("document", "window"):
+            for subset in subsets:
+                with self.subTest(mode=mode, subset=subset):
+                    C1, m1, n1, _ = self.dense(self.plain, mode, **subset)
+                    C2, m2, n2, _ = self.dense(self.shared, mode, **subset)
+                    np.testing.assert_allclose(C1, C2)
+                    np.testing.assert_allclose(m1, m2)
+                    self.assertEqual(n1, n2)
+
+    def test_subset_counts_only_matching_members(self):
+        C, marginals, n, pos = self.dense(self.shared, "document", auteur="A")
+        self.assertEqual(n, 3)
+        self.assertEqual(C[pos["new"], pos["york"]], 2)  # docs 0 and 3, not doc 1 (auteur B)
+        self.assertEqual(marginals[pos["city"]], 3)
+
+    def test_window_same_word_pairs_counted_once(self):
+        C, _, _, pos = self.dense(self.plain, "window", auteur="A", type="Document")
+        # "new new york city": (new, new) at distance 1 once
+        self.assertEqual(C[pos["new"], pos["new"]], 1)
+        self.assertEqual(C[pos["new"], pos["york"]], 2)
+        np.testing.assert_allclose(C, C.T)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# test_dedup.py
+"""
+Duplicate detection in the Corpus (dedup.Deduplicator) and shared rows in
+SearchEngine(unique_texts=True).
+
+    python -m unittest test_dedup      (or: python -m pytest test_dedup.py)
+"""
+import unittest
+from datetime import datetime
+
+from Corpus import Corpus
+from Document import Document, SpeechDocument
+from SearchEngine import SearchEngine
+from dedup import Deduplicator
+
+WORDS = ("the nation must invest in roads schools and hospitals so that every family "
+         "can build a future of work dignity and hope across all our states").split()
+LONG = " ".join(WORDS * 4)
+
+
+def doc(texte: str, auteur: str = "A") -> Document:
+    return Document("t", auteur, datetime(2020, 1, 1), "", texte)
+
+
+def speech(sentences, titre: str = "s") -> SpeechDocument:
+    texte, spans = "", []
+    for sent in sentences:
+        start = len(texte) + (1 if texte else 0)
+        texte = f"{texte} {sent}" if texte else sent
+        spans.append((start, len(texte)))
+    return SpeechDocument(titre, "A", datetime(2020, 1, 1), "", texte, spans)
+
+
+class DedupTest(unittest.TestCase):
+
+    def test_exact(self):
+        corpus = Corpus("t", dedup=Deduplicator(near=False))
+        first = corpus.add_document(doc("Thank you, God bless America!"))
+        self.assertIsNone(corpus.add_document(doc("thank you god bless america")))
+        self.assertEqual(corpus.ndoc, 1)
+        self.assertEqual(corpus.dedup.canonical[1][:2], (first, "exact"))
+
+    def test_exact_kept_without_drop(self):
+        corpus = Corpus("t", dedup=Deduplicator(near=False, drop=False))
+        corpus.add_document(doc("same text"))
+        self.assertEqual(corpus.add_document(doc("same text")), 1)
+        self.assertEqual(corpus.ndoc, 2)
+        self.assertEqual(corpus.dedup.clusters(), {0: [1]})
+
+    def test_near(self):
+        corpus = Corpus("t", dedup=Deduplicator())
+        corpus.add_document(doc(LONG))
+        self.assertIsNone(corpus.add_document(doc(LONG.replace("hope", "faith", 1))))
+        _, kind, sim = corpus.dedup.canonical[1]
+        self.assertEqual(kind, "near")
+        self.assertGreaterEqual(sim, 0.8)
+        self.assertEqual(corpus.add_document(doc("an entirely different text about the weather")), 2)
+
+    def test_batch(self):
+        corpus = Corpus("t", dedup=Deduplicator())
+        ids = corpus.add_documents([doc(LONG), doc("short one"), doc(LONG), doc("short one"),
+                                    doc(LONG.replace("roads", "bridges", 1))])
+        self.assertEqual(ids, [0, 1, None, None, None])
+        self.assertEqual(corpus.ndoc, 2)
+        self.assertEqual(sorted(corpus.dedup.canonical), [2, 3, 4])
+
+    def test_load(self):
+        import os
+        import tempfile
+        corpus = Corpus("t")
+        for texte in ("one text", "one text", "another text"):
+            corpus.add_document(doc(texte))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "c.tsv")
+            corpus.save(path)
+            self.assertEqual(Corpus.load("t", path).ndoc, 3)
+            self.assertEqual(Corpus.load("t", path, dedup=Deduplicator(near=False)).ndoc, 2)
+
+
+class SpeechDedupTest(unittest.TestCase):
+
+    def test_duplicate_speech_skipped(self):
+        corpus = Corpus("t", dedup=Deduplicator())
+        sentences = ["We will rebuild.", "Thank you.", "God bless America."]
+        self.assertEqual(corpus.add_speech(speech(sentences)), 0)
+        self.assertIsNone(corpus.add_speech(speech(sentences)))  # same CSV loaded twice
+        self.assertEqual(len(corpus.speeches), 1)
+        self.assertEqual(corpus.ndoc, 3)
+        self.assertEqual(corpus.dedup.speech_canonical[1][:2], (0, "exact"))
+
+    def test_repeated_sentences_kept(self):
+        corpus = Corpus("t", dedup=Deduplicator())
+        corpus.add_speech(speech(["We will rebuild.", "Thank you."]))
+        corpus.add_speech(speech(["Jobs are back.", "Thank you."]))
+        self.assertEqual([s.doc_ids for s in corpus.speeches.values()], [[0, 1], [2, 3]])
+        self.assertEqual(corpus.dedup.canonical, {3: (1, "exact", 1.0)})
+
+    def test_search_speeches_shared_sentence(self):
+        corpus = Corpus("t", dedup=Deduplicator())
+        corpus.add_speech(speech(["Thank you so much.", "Taxes are lower."], titre="first"))
+        corpus.add_speech(speech(["Jobs are back.", "Thank you so much."], titre="second"))
+        engine = SearchEngine(corpus, unique_texts=True)
+        self.assertEqual(len(engine.doc_ids), 3)
+        res = engine.search_speeches("thank you much")
+        self.assertEqual(len(res), 2)
+        for _, row in res.iterrows():
+            best = corpus.id2doc[row["best_doc_id"]]
+            self.assertEqual(best.parent_id, row["speech_id"])
+            self.assertEqual(row["extrait"], "Thank you so much.")
+
+
+if __name__ == "__main__":
+    unittest.main()
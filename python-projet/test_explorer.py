@@ -0,0 +1,44 @@
+# test_explorer.py
+"""
+Explorer comparisons (map-reduce FieldCounts jobs).
+
+    python -m unittest test_explorer      (or: python -m pytest test_explorer.py)
+"""
+import unittest
+from datetime import datetime
+
+from Corpus import Corpus
+from Document import ArxivDocument, RedditDocument
+from explorer import Explorer
+
+
+class CompareTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        corpus = Corpus("t")
+        corpus.add_document(RedditDocument("t", "CLINTON", datetime(2016, 1, 1), "", "health care for all"))
+        corpus.add_document(RedditDocument("t", "TRUMP", datetime(2016, 1, 1), "", "build the wall"))
+        corpus.add_document(ArxivDocument("t", "TRUMP", datetime(2016, 1, 1), "", "make america great"))
+        cls.explorer = Explorer(corpus)
+
+    def test_compare_by_type(self):
+        df = self.explorer.compare_by_type("Reddit", "Arxiv", top_n=50)
+        row = df.set_index("mot").loc["wall"]
+        self.assertEqual((row["tf_Reddit"], row["tf_Arxiv"]), (1, 0))
+        self.assertAlmostEqual(row["diff_rel"], 1 / 7)
+
+    def test_compare_by_author(self):
+        df = self.explorer.compare_by_author("CLINTON", "TRUMP", top_n=50)
+        self.assertEqual(df.iloc[0]["diff_rel"], 1 / 4)
+        self.assertEqual(df.set_index("mot").loc["america", "tf_TRUMP"], 1)
+
+    def test_same_value_rejected(self):
+        with self.assertRaises(ValueError):
+            self.explorer.compare_by_type("Reddit", "Reddit")
+        with self.assertRaises(ValueError):
+            self.explorer.compare_by_author("TRUMP", "TRUMP")
+
+
+if __name__ == "__main__":
+    unittest.main()
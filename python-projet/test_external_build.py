@@ -0,0 +1,88 @@
+# test_external_build.py
+"""
+The out-of-core build (external_build) must publish the same index as
+query_server.publish_index(SearchEngine(corpus)), even with a budget small
+enough to force several sorted runs and a block-wise merge.
+
+    python -m unittest test_external_build      (or: python -m pytest test_external_build.py)
+"""
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from Corpus import Corpus
+from Document import ArxivDocument, RedditDocument
+from SearchEngine import SearchEngine
+from external_build import ExternalIndexBuilder, iter_corpus_documents, iter_tsv_documents
+from query_server import IndexSnapshot, publish_index
+
+ARRAYS = ["indices", "indptr", "vocab", "doc_ids", "meta_offsets"]
+
+
+def synthetic_corpus(n_docs: int = 400, seed: int = 0) -> Corpus:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = [a + b + c for a in letters[:8] for b in letters[8:16] for c in letters[16:21]]  # 320
+    words += ["america", "freedom", "jobs", "climate"]
+    corpus = Corpus("t")
+    for i in range(n_docs):
+        texte = " ".join(rng.choice(words) for _ in range(rng.randint(0, 40)))
+        cls = RedditDocument if i % 2 else ArxivDocument
+        corpus.add_document(cls(f"doc {i}", f"author{i % 7}", datetime(2020, 1, 1 + i % 28),
+                                f"http://example.org/{i}", texte))
+    return corpus
+
+
+class ExternalBuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def assertSameIndex(self, expected: str, got: str):
+        a, b = IndexSnapshot(expected), IndexSnapshot(got)
+        self.assertEqual((a.N, a.V), (b.N, b.V))
+        for name in ARRAYS:
+            np.testing.assert_array_equal(getattr(a, name), getattr(b, name), err_msg=name)
+        np.testing.assert_allclose(a.data, b.data, rtol=1e-6, atol=1e-7)
+        np.testing.assert_allclose(a.idf, b.idf, rtol=1e-6)
+        self.assertEqual(bytes(a.meta), bytes(b.meta))
+        for q in ("america freedom", "jobs", "aiq bjr cks"):
+            ra, rb = a.search(q, 10), b.search(q, 10)
+            self.assertEqual([r["doc_id"] for r in ra], [r["doc_id"] for r in rb], q)
+            np.testing.assert_allclose([r["score"] for r in ra], [r["score"] for r in rb], rtol=1e-5)
+
+    def test_same_as_publish_index(self):
+        corpus = synthetic_corpus()
+        expected = publish_index(SearchEngine(corpus), self.path("mem"))
+        builder = ExternalIndexBuilder(self.path("ext"), memory_limit_mb=0.01)
+        got = builder.build(iter_corpus_documents(corpus))
+        self.assertGreater(len(builder.runs), 3)  # several sorted runs to merge
+        self.assertGreater(IndexSnapshot(got).manifest["nnz"], 10 * (builder.budget // 64))  # many merge blocks
+        self.assertSameIndex(expected, got)
+
+    def test_tsv_stream(self):
+        corpus = synthetic_corpus(n_docs=150, seed=1)
+        tsv = self.path("corpus.tsv")
+        corpus.save(tsv)
+        expected = publish_index(SearchEngine(Corpus.load("t", tsv)), self.path("mem"))
+        got = ExternalIndexBuilder(self.path("ext"), memory_limit_mb=0.01).build(iter_tsv_documents(tsv, chunksize=32))
+        self.assertSameIndex(expected, got)
+
+    def test_empty_corpus(self):
+        corpus = Corpus("empty")
+        expected = publish_index(SearchEngine(corpus), self.path("mem"))
+        got = ExternalIndexBuilder(self.path("ext"), memory_limit_mb=0.01).build(iter_corpus_documents(corpus))
+        a, b = IndexSnapshot(expected), IndexSnapshot(got)
+        self.assertEqual((a.N, a.V, len(a.data)), (b.N, b.V, len(b.data)))
+
+
+if __name__ == "__main__":
+    unittest.main()
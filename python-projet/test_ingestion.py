@@ -0,0 +1,67 @@
+# test_ingestion.py
+"""
+Offline checks of the ingestion pipeline with RecordedSource.
+
+    python -m unittest test_ingestion      (or: python -m pytest test_ingestion.py)
+"""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from Corpus import Corpus
+from Document import ArxivDocument, RedditDocument
+from ingestion import RecordedSource, Source, ingest
+
+REDDIT = [
+    {"source": "reddit", "titre": f"post {i}", "auteur": "alice", "date": "2020-01-0%d" % (i + 1),
+     "url": f"http://reddit.test/{i}", "texte": f"reddit text number {i}", "nb_commentaires": i}
+    for i in range(3)
+]
+ARXIV = [
+    {"source": "arxiv", "titre": f"paper {i}", "auteur": "bob", "date": "2021-05-01",
+     "url": f"http://arxiv.test/{i}", "texte": f"arxiv abstract number {i}", "co_auteurs": ["carol"]}
+    for i in range(4)
+]
+
+
+class _Failing(Source):
+    name = "failing"
+
+    async def records(self):
+        yield dict(REDDIT[0])
+        raise RuntimeError("source down")
+
+
+class IngestTest(unittest.TestCase):
+
+    def test_recorded_sources(self):
+        corpus = Corpus("test")
+        added = ingest(corpus, [RecordedSource(REDDIT), RecordedSource(ARXIV)], batch_size=2)
+        self.assertEqual(added, 7)
+        self.assertEqual(corpus.ndoc, 7)
+        types = sorted(type(d).__name__ for d in corpus.id2doc.values())
+        self.assertEqual(types.count(RedditDocument.__name__), 3)
+        self.assertEqual(types.count(ArxivDocument.__name__), 4)
+        self.assertEqual(set(corpus.authors), {"alice", "bob"})
+        self.assertEqual(corpus.authors["bob"].ndoc, 4)
+
+    def test_from_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "records.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(ARXIV, f)
+            corpus = Corpus("test")
+            self.assertEqual(ingest(corpus, [RecordedSource.from_json(path)]), 4)
+        doc = corpus.id2doc[0]
+        self.assertIsInstance(doc, ArxivDocument)
+        self.assertEqual(doc.date, datetime(2021, 5, 1))
+
+    def test_source_error_is_raised(self):
+        with self.assertRaises(RuntimeError):
+            ingest(Corpus("test"), [_Failing(), RecordedSource(ARXIV)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# test_sharding.py
+"""
+Scatter-gather search (sharding.ShardedSearchEngine) must score like a
+single SearchEngine over the whole corpus, under both partition schemes.
+Shards run in-process (processes=False).
+
+    python -m unittest test_sharding      (or: python -m pytest test_sharding.py)
+"""
+import random
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from Corpus import Corpus
+from Document import Document
+from SearchEngine import SearchEngine
+from sharding import ShardedCorpus, ShardedSearchEngine
+
+QUERIES = ["america freedom", "jobs", "climate change economy", "abc", "unknownword", ""]
+
+
+def synthetic_corpus(n_docs: int = 300, seed: int = 0) -> Corpus:
+    rng = random.Random(seed)
+    letters = "abcdefghij"
+    words = [a + b + c for a in letters for b in letters[:6] for c in letters[:4]]
+    words += ["america", "freedom", "jobs", "climate", "change", "economy"]
+    corpus = Corpus("t")
+    for i in range(n_docs):
+        texte = " ".join(rng.choice(words) for _ in range(rng.randint(1, 30)))
+        corpus.add_document(Document(f"doc {i}", f"author{i % 5}", datetime(2020, 1, 1), "", texte))
+    return corpus
+
+
+class ShardingTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = synthetic_corpus()
+        cls.engine = SearchEngine(cls.corpus)
+
+    def top(self, q: str, top_n: int):
+        """Single-engine results with a positive score (shards never return zero scores)."""
+        df = self.engine.search(q, top_n=top_n)
+        return df[df["score"] > 0] if len(df) else df
+
+    def check(self, scheme: str, k: int, top_n: int = 15):
+        sharded = ShardedCorpus.from_corpus(self.corpus, k=k, scheme=scheme)
+        self.assertEqual(sharded.ndoc, self.corpus.ndoc)
+        with ShardedSearchEngine(sharded, processes=False) as engine:
+            for q in QUERIES:
+                with self.subTest(scheme=scheme, k=k, q=q):
+                    expected = self.top(q, top_n)
+                    got = engine.search(q, top_n=top_n)
+                    self.assertEqual(len(got), len(expected))
+                    got_scores = got["score"].to_numpy(dtype=float)
+                    np.testing.assert_allclose(got_scores, expected["score"].to_numpy(dtype=float),
+                                               rtol=1e-9, atol=1e-12)
+                    nxt = self.top(q, top_n + 1)["score"].to_numpy(dtype=float)
+                    if len(nxt) <= len(expected) or nxt[-1] < nxt[-2]:
+                        # no tie at the cut-off: same ids (order of equal scores aside)
+                        key = lambda df: sorted(zip(np.round(df["score"].to_numpy(dtype=float), 9), df["doc_id"]))
+                        self.assertEqual(key(got), key(expected))
+                    else:  # any of the tied documents may come back
+                        full = self.engine.search(q, top_n=self.corpus.ndoc).set_index("doc_id")["score"]
+                        np.testing.assert_allclose(full.loc[list(got["doc_id"])].to_numpy(), got_scores, rtol=1e-9)
+
+    def test_hash(self):
+        for k in (1, 3, 4):
+            self.check("hash", k)
+
+    def test_range(self):
+        for k in (1, 3, 4):
+            self.check("range", k)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,82 @@
 # text_utils.py
 import re
-from typing import List
+from itertools import islice
+from typing import Hashable, Iterable, Iterator, List, Optional, Tuple
 
 _SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
 
+# (speech_id, sentence_index, start, end) -- text[start:end] is the sentence
+SentenceSpan = Tuple[Hashable, int, int, int]
+
+
+def iter_sentence_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) offsets of the sentences of `text`, without copying.
+    Same segmentation as split_sentences: split on whitespace after [.!?],
+    fragments shorter than 2 characters are dropped.
+    """
+    if not text:
+        return
+    n = len(text)
+    start = 0
+    while start < n and text[start].isspace():
+        start += 1
+
+    for m in _SENT_SPLIT.finditer(text, start):
+        end = m.start()
+        if end - start >= 2:
+            yield start, end
+        start = m.end()
+
+    end = n
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end - start >= 2:
+        yield start, end
+
+
 def split_sentences(text: str) -> List[str]:
     """Split a long speech into sentences (simple regex-based)."""
-    if not text:
-        return []
-    text = text.replace("\n", " ").strip()
-    parts = _SENT_SPLIT.split(text)
-    # remove tiny/empty sentences
-    return [p.strip() for p in parts if p and p.strip() and len(p.strip()) >= 2]
+    return [text[s:e].replace("\n", " ") for s, e in iter_sentence_spans(text)]
+
+
+def iter_sentence_offsets(speeches: Iterable[Tuple[Hashable, str]]) -> Iterator[SentenceSpan]:
+    """Stream (speech_id, sentence_index, start, end) for (speech_id, text) pairs."""
+    for speech_id, text in speeches:
+        for i, (s, e) in enumerate(iter_sentence_spans(text)):
+            yield speech_id, i, s, e
+
+
+def _offsets_for_chunk(chunk: List[Tuple[Hashable, str]]) -> List[SentenceSpan]:
+    # worker side: only offsets travel back to the parent process
+    return list(iter_sentence_offsets(chunk))
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def sentence_offsets(
+    speeches: Iterable[Tuple[Hashable, str]],
+    processes: Optional[int] = None,
+    chunksize: int = 64,
+) -> Iterator[SentenceSpan]:
+    """
+    Sentence-segmentation stage for large speech dumps.
+    processes=None or 1 -> serial generator; otherwise speeches are sent by
+    chunks of `chunksize` to a process pool. Output order is preserved.
+    """
+    if processes is None or processes <= 1:
+        yield from iter_sentence_offsets(speeches)
+        return
+
+    from multiprocessing import Pool
+
+    with Pool(processes) as pool:
+        for spans in pool.imap(_offsets_for_chunk, _chunks(speeches, chunksize)):
+            yield from spans
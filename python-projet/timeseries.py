@@ -0,0 +1,262 @@
+# timeseries.py
+"""
+TD9-10: term-level time series, maintained as documents are added.
+
+    ts = TermTimeSeries.attach(corpus)          # index existing documents + every later add
+    ts.series("america", freq="M")              # period | hits | total | rel_freq
+    ts.trending(freq="W", window=4, top_n=10)   # bursting terms of the last week
+
+Counts are kept per term and per day in a CSR matrix (terms x days, int32),
+with the number of tokens per day in a dense array. Documents added later go
+to a small pending buffer that is merged into the matrix on the next read.
+Week / month / year series are rollups of the day columns (one sparse
+product per frequency, cached until the next merge). Bursts are computed on
+calendar-contiguous periods: periods without tokens count as zeros.
+Documents without a known date (Document.UNKNOWN_DATE) are counted in a
+separate unknown bucket instead of a day column.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+
+import mapreduce
+from Document import is_unknown_date
+from profiling import count, stage
+
+SERIES_COLUMNS = ["period", "hits", "total", "rel_freq"]
+
+
+def day_of(dt) -> Optional[int]:
+    """Proleptic ordinal of the day of dt, None for an unknown date."""
+    return None if is_unknown_date(dt) else dt.toordinal()
+
+
+class DayCounts(mapreduce.Analysis):
+    """(term, day) -> occurrences and day -> tokens; day None = unknown date."""
+
+    def map(self, corpus, docs):
+        pairs: Counter = Counter()
+        totals: Counter = Counter()
+        for doc in docs:
+            toks = mapreduce.tokens(corpus, doc.texte)
+            if not toks:
+                continue
+            d = day_of(doc.date)
+            totals[d] += len(toks)
+            for w, c in Counter(toks).items():
+                pairs[w, d] += c
+        return pairs, totals
+
+    def reduce(self, acc, part):
+        acc[0].update(part[0])
+        acc[1].update(part[1])
+        return acc
+
+
+class TermTimeSeries:
+    """
+    Per-term day counts with incremental updates.
+    - counts: CSR (terms x days) of occurrences, column k = day day0 + k
+    - totals: tokens per day
+    - unknown / unknown_total: the same counts for documents without a date
+    """
+
+    def __init__(self, corpus=None):
+        self.corpus = corpus
+        self.term_ids: Dict[str, int] = {}
+        self.words: List[str] = []
+        self.day0: Optional[int] = None
+        self.counts = csr_matrix((0, 0), dtype=np.int32)
+        self.totals = np.zeros(0, dtype=np.int64)
+        self.unknown: Counter = Counter()
+        self.unknown_total = 0
+
+        self._pending: Counter = Counter()  # (term id, day) -> count
+        self._pending_totals: Counter = Counter()
+        self._rollups: dict = {}  # freq -> (labels, counts, totals)
+
+    @classmethod
+    def attach(cls, corpus, processes: Optional[int] = None) -> "TermTimeSeries":
+        """Index every document of corpus, then keep up with corpus.add_document."""
+        ts = cls(corpus)
+        with stage("timeseries.attach"):
+            pairs, totals = mapreduce.run(corpus, DayCounts(), processes=processes)
+            ts.add_counts(pairs, totals)
+            ts._merge()
+        corpus.timeseries = ts
+        return ts
+
+    # Updates
+
+    def add(self, doc_id: int, document) -> None:
+        """Called by Corpus for every stored document."""
+        self.add_counts(*DayCounts().map(self.corpus, [document]))
+
+    def add_counts(self, pairs: Counter, totals: Counter) -> None:
+        for (w, d), c in pairs.items():
+            if d is None:
+                self.unknown[w] += c
+                continue
+            t = self.term_ids.get(w)
+            if t is None:
+                t = self.term_ids[w] = len(self.words)
+                self.words.append(w)
+            self._pending[t, d] += c
+        for d, n in totals.items():
+            if d is None:
+                self.unknown_total += n
+            else:
+                self._pending_totals[d] += n
+
+    def _merge(self) -> None:
+        """Fold the pending counts into the CSR matrix and the day totals."""
+        if not self._pending and not self._pending_totals:
+            if self.counts.shape[0] < len(self.words):
+                self.counts.resize((len(self.words), self.counts.shape[1]))
+            return
+        with stage("timeseries.merge"):
+            days = list(self._pending_totals)
+            lo, hi = min(days), max(days)
+            if self.day0 is not None:
+                lo = min(lo, self.day0)
+                hi = max(hi, self.day0 + len(self.totals) - 1)
+            n_days = hi - lo + 1
+
+            old = self.counts.tocoo()
+            shift = 0 if self.day0 is None else self.day0 - lo
+            keys = np.array(list(self._pending), dtype=np.int64).reshape(-1, 2)
+            rows = np.concatenate([old.row, keys[:, 0]])
+            cols = np.concatenate([old.col + shift, keys[:, 1] - lo])
+            vals = np.concatenate([old.data, np.fromiter(self._pending.values(), dtype=np.int32)])
+            self.counts = coo_matrix((vals, (rows, cols)), shape=(len(self.words), n_days),
+                                     dtype=np.int32).tocsr()
+
+            totals = np.zeros(n_days, dtype=np.int64)
+            totals[shift:shift + len(self.totals)] = self.totals
+            for d, n in self._pending_totals.items():
+                totals[d - lo] += n
+            self.totals = totals
+            self.day0 = lo
+        count("timeseries.merged", len(self._pending))
+        self._pending.clear()
+        self._pending_totals.clear()
+        self._rollups = {}
+
+    # Rollups
+
+    def rollup(self, freq: str = "D", contiguous: bool = False):
+        """
+        (period labels, counts terms x periods, totals per period) for a pandas
+        period alias ('D', 'W', 'M', 'Y'...). Periods without tokens are left
+        out, or kept with zero counts if contiguous=True (every period from the
+        first to the last one).
+        """
+        self._merge()
+        key = (freq, contiguous)
+        hit = self._rollups.get(key)
+        if hit is not None:
+            return hit
+        with stage("timeseries.rollup"):
+            used = np.flatnonzero(self.totals)
+            if len(used) == 0:
+                labels = pd.DatetimeIndex([])
+                out = (labels, csr_matrix((len(self.words), 0), dtype=np.int64), np.zeros(0, dtype=np.int64))
+            else:
+                start = np.datetime64(date.fromordinal(self.day0), "D")
+                days = pd.DatetimeIndex(start + used)
+                periods = days.to_period(freq)
+                if contiguous:
+                    full = pd.period_range(periods.min(), periods.max(), freq=periods.freq)
+                    code = full.get_indexer(periods)
+                    labels = full.to_timestamp().values
+                else:
+                    labels, code = np.unique(periods.to_timestamp().values, return_inverse=True)
+                M = csr_matrix((np.ones(len(used), dtype=np.int64), (used, code)),
+                               shape=(len(self.totals), len(labels)))
+                out = (pd.DatetimeIndex(labels), (self.counts @ M).tocsr(), self.totals @ M)
+        self._rollups[key] = out
+        return out
+
+    def series(self, term: str, freq: str = "M", contiguous: bool = False) -> pd.DataFrame:
+        """
+        Same columns as Explorer.temporal_trend: period | hits | total | rel_freq
+        (contiguous=True: periods without tokens included, with zeros).
+        """
+        labels, counts, totals = self.rollup(freq, contiguous=contiguous)
+        t = self.term_ids.get(term.lower().strip())
+        hits = np.zeros(len(labels), dtype=np.int64)
+        if t is not None:
+            hits = np.asarray(counts[t].toarray()).ravel().astype(np.int64)
+        df = pd.DataFrame({"period": labels, "hits": hits, "total": np.asarray(totals, dtype=np.int64)},
+                          columns=SERIES_COLUMNS[:3])
+        df["rel_freq"] = df["hits"] / df["total"].replace(0, 1)
+        return df
+
+    # Bursts
+
+    @staticmethod
+    def _burst(hits, history_hits, history_total, total):
+        """
+        Poisson z-score of the current count against the rate of the history
+        window: (hits - expected) / sqrt(expected + 1).
+        """
+        rate = history_hits / np.maximum(history_total, 1)
+        expected = rate * total
+        return (hits - expected) / np.sqrt(expected + 1.0), expected
+
+    def trending(self, freq: str = "W", window: int = 4, at=None, top_n: int = 20,
+                 min_count: int = 5) -> pd.DataFrame:
+        """
+        Terms whose frequency in period `at` (default: the last one) jumps the
+        most above their rate over the `window` previous calendar periods,
+        computed for all terms at once.
+        """
+        cols = ["mot", "hits", "expected", "burst"]
+        labels, counts, totals = self.rollup(freq, contiguous=True)
+        if len(labels) < 2:
+            return pd.DataFrame(columns=cols)
+        p = len(labels) - 1 if at is None else int(labels.get_indexer([pd.Timestamp(at).to_period(freq).to_timestamp()])[0])
+        if p < 1:
+            return pd.DataFrame(columns=cols)
+        lo = max(0, p - window)
+
+        with stage("timeseries.trending"):
+            hits = np.asarray(counts[:, p].toarray()).ravel()
+            history = np.asarray(counts[:, lo:p].sum(axis=1)).ravel()
+            score, expected = self._burst(hits, history, totals[lo:p].sum(), totals[p])
+            score[hits < min_count] = -np.inf
+            k = min(top_n, int(np.isfinite(score).sum()))
+            if k <= 0:
+                return pd.DataFrame(columns=cols)
+            top = np.argpartition(-score, k - 1)[:k]
+            top = top[np.argsort(-score[top], kind="stable")]
+        return pd.DataFrame({
+            "mot": [self.words[t] for t in top],
+            "hits": hits[top].astype(int),
+            "expected": expected[top],
+            "burst": score[top],
+        }, columns=cols)
+
+    def burst_series(self, term: str, freq: str = "W", window: int = 4) -> pd.DataFrame:
+        """
+        Burst score of one term in every calendar period, over a sliding
+        window (cumulative sums).
+        """
+        df = self.series(term, freq=freq, contiguous=True)
+        hits = df["hits"].to_numpy(dtype=float)
+        total = df["total"].to_numpy(dtype=float)
+        ch = np.concatenate([[0.0], np.cumsum(hits)])
+        ct = np.concatenate([[0.0], np.cumsum(total)])
+        idx = np.arange(len(df))
+        lo = np.maximum(0, idx - window)
+        score, expected = self._burst(hits, ch[idx] - ch[lo], ct[idx] - ct[lo], total)
+        score[idx == 0] = 0.0  # no history yet
+        df["expected"] = expected
+        df["burst"] = score
+        return df